@@ -1,17 +1,190 @@
 import sqlite3
-import pandas as pd
 import json
-
+import base64
+import heapq
+import argparse
+import os
+import csv
+import threading
+import textwrap
+import re
+from collections import OrderedDict
+import sys
+import io
+import contextlib
+from functools import partial
+import time
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+#Instrumentação ======================================================================================================================
+
+# Consultas, cargas e relatórios que passarem deste tempo (em segundos) vão para o log de consultas lentas (None desliga o log)
+LIMITE_LENTIDAO_SEGUNDOS = 0.5
+ARQUIVO_LOG_LENTAS = 'consultas_lentas.log'
+
+# Métricas da execução atual, planos de execução já obtidos e funções externas que recebem cada métrica
+_metricas = []
+_planos_metricas = {}
+_ganchos_metricas = []
+_trava_metricas = threading.Lock()
+
+# Marca, por thread, que um gancho está em execução: métricas registradas dentro dele (por exemplo, de uma consulta feita
+# pelo gancho) são guardadas, mas não chamam os ganchos de novo
+_estado_ganchos = threading.local()
+
+# Função para registrar um gancho: ela é chamada com o dicionário de cada métrica registrada (ex.: enviar a um coletor)
+def registrar_gancho_metricas(funcao):
+    _ganchos_metricas.append(funcao)
+
+# Função para registrar uma métrica (tipo: 'consulta', 'carga', 'relatorio', 'exportacao'...)
+def registrar_metrica(tipo, nome, segundos, linhas=None, bytes_saida=None, plano=None, **extras):
+    metrica = {
+        'tipo': tipo,
+        'nome': nome,
+        'inicio': time.time() - segundos,
+        'segundos': segundos,
+        'linhas': linhas,
+        'bytes_saida': bytes_saida,
+        **extras,
+    }
+    with _trava_metricas:
+        _metricas.append(metrica)
+        if plano is not None:
+            _planos_metricas[nome] = plano
+
+    if LIMITE_LENTIDAO_SEGUNDOS is not None and segundos >= LIMITE_LENTIDAO_SEGUNDOS:
+        with _trava_metricas, open(ARQUIVO_LOG_LENTAS, 'a', encoding="utf-8") as f:
+            f.write(json.dumps({**metrica, 'plano': plano}, ensure_ascii=False) + '\n')
+
+    if getattr(_estado_ganchos, 'ativo', False):
+        return metrica
+    _estado_ganchos.ativo = True
+    try:
+        for gancho in list(_ganchos_metricas):
+            try:
+                gancho(metrica)
+            except Exception as e:
+                print(f"\nErro no gancho de métricas {getattr(gancho, '__name__', gancho)}: {e}")
+    finally:
+        _estado_ganchos.ativo = False
+    return metrica
+
+# Função para incorporar métricas vindas de outro processo (relatórios pandas rodam em processos filhos)
+def incorporar_metricas(metricas, planos):
+    with _trava_metricas:
+        _metricas.extend(metricas)
+        _planos_metricas.update(planos)
+
+# Resumo da execução: totais por tipo e por nome, entradas lentas e planos de execução
+def resumo_metricas():
+    with _trava_metricas:
+        metricas = list(_metricas)
+        planos = dict(_planos_metricas)
+
+    por_nome = {}
+    for metrica in metricas:
+        chave = f"{metrica['tipo']}:{metrica['nome']}"
+        agregado = por_nome.setdefault(chave, {'tipo': metrica['tipo'], 'nome': metrica['nome'], 'execucoes': 0,
+                                               'segundos_total': 0.0, 'segundos_max': 0.0, 'linhas': 0, 'bytes_saida': 0})
+        agregado['execucoes'] += 1
+        agregado['segundos_total'] += metrica['segundos']
+        agregado['segundos_max'] = max(agregado['segundos_max'], metrica['segundos'])
+        agregado['linhas'] += metrica['linhas'] or 0
+        agregado['bytes_saida'] += metrica['bytes_saida'] or 0
+        if metrica['nome'] in planos:
+            agregado['plano'] = planos[metrica['nome']]
+
+    return {
+        'limite_lentidao_segundos': LIMITE_LENTIDAO_SEGUNDOS,
+        'total_metricas': len(metricas),
+        'agregados': sorted(por_nome.values(), key=lambda agregado: agregado['segundos_total'], reverse=True),
+        'lentas': [metrica for metrica in metricas
+                   if LIMITE_LENTIDAO_SEGUNDOS is not None and metrica['segundos'] >= LIMITE_LENTIDAO_SEGUNDOS],
+        'metricas': metricas,
+    }
+
+# Função para salvar o resumo da execução em JSON
+def salvar_metricas(nome_arquivo='metricas_execucao.json'):
+    with open(nome_arquivo, 'w', encoding="utf-8") as f:
+        json.dump(resumo_metricas(), f, indent=4, ensure_ascii=False)
+
+#Conexões com o banco de dados ======================================================================================================
+
+CAMINHO_BANCO = 'DataDB.db'
+
+# Pragmas aplicados a toda conexão: WAL para leitores não bloquearem o escritor, cache de páginas maior e I/O via mmap
+PRAGMAS_CONEXAO = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
+# Quantidade de comandos preparados mantidos em cache por conexão
+TAMANHO_CACHE_COMANDOS = 256
+
+# Cada thread mantém sua própria conexão de escrita e de leitura; a geração invalida as conexões após fechar_conexoes()
+_conexoes_locais = threading.local()
+_todas_conexoes = []
+_trava_conexoes = threading.Lock()
+_geracao_conexoes = 0
+
+# Função para abrir uma nova conexão já configurada
+def abrir_conexao(somente_leitura=False):
+    if somente_leitura:
+        conn = sqlite3.connect(f'file:{CAMINHO_BANCO}?mode=ro', uri=True,
+                               cached_statements=TAMANHO_CACHE_COMANDOS, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(CAMINHO_BANCO, cached_statements=TAMANHO_CACHE_COMANDOS, check_same_thread=False)
+
+    for nome, valor in PRAGMAS_CONEXAO.items():
+        # O modo de journal e a sincronização só podem ser alterados por quem escreve
+        if somente_leitura and nome in ('journal_mode', 'synchronous'):
+            continue
+        conn.execute(f"PRAGMA {nome} = {valor};")
+    if somente_leitura:
+        conn.execute("PRAGMA query_only = ON;")
+    return conn
+
+# Função para obter a conexão de longa duração da thread atual, abrindo-a apenas na primeira vez
+def obter_conexao(somente_leitura=False):
+    atributo = 'leitura' if somente_leitura else 'escrita'
+    geracao, conn = getattr(_conexoes_locais, atributo, (None, None))
+    if conn is None or geracao != _geracao_conexoes:
+        conn = abrir_conexao(somente_leitura)
+        setattr(_conexoes_locais, atributo, (_geracao_conexoes, conn))
+        with _trava_conexoes:
+            _todas_conexoes.append((somente_leitura, conn))
+    return conn
+
+# Função para fechar todas as conexões compartilhadas (de todas as threads)
+def fechar_conexoes():
+    global _geracao_conexoes
+    with _trava_conexoes:
+        # As de leitura fecham antes, para que a última conexão de escrita possa fazer o checkpoint do WAL
+        for _, conn in sorted(_todas_conexoes, key=lambda item: not item[0]):
+            conn.close()
+        _todas_conexoes.clear()
+        _geracao_conexoes += 1
 
 #Criando as tabelas ================================================================================================================
+
+# Esquema declarado de cada tabela, usado pelo comando init e pela carga em massa (que recria tabelas sem perder PRIMARY KEY/FOREIGN KEY)
+ESQUEMAS = {}
+
 def criar_tabela(nome_tabela, query):
     try:
-        # Conectar ao banco de dados
-        conn = sqlite3.connect('DataDB.db')
+        # Obter a conexão compartilhada com o banco de dados
+        conn = obter_conexao()
         cursor = conn.cursor()
 
         # Verificar se a tabela já existe
-        cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{nome_tabela}';")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?;", (nome_tabela,))
         if cursor.fetchone():
             print(f"\nTabela {nome_tabela} já existe.")
             print("\n=====================================================================")
@@ -21,9 +194,7 @@ def criar_tabela(nome_tabela, query):
             print(f"\nTabela {nome_tabela} criada com sucesso!")
             print("\n=====================================================================")
 
-        # Fechar a conexão com o banco de dados
         conn.commit()
-        conn.close()
     except Exception as e:
         print(f"\nErro ao criar a tabela {nome_tabela}: {e}")
 
@@ -40,7 +211,7 @@ CREATE TABLE IF NOT EXISTS Funcionarios (
     FOREIGN KEY (DepartamentoID) REFERENCES Departamentos(DepartamentoID)
 );
                ''')
-criar_tabela('Funcionarios', query)
+ESQUEMAS['Funcionarios'] = query
 
 #Tabela Cargos
 query = ('''
@@ -52,7 +223,7 @@ CREATE TABLE IF NOT EXISTS Cargos (
     Beneficios VARCHAR(100)
 );
                ''')
-criar_tabela('Cargos', query)
+ESQUEMAS['Cargos'] = query
 
 #Tabela Departamentos
 query = ('''
@@ -65,7 +236,7 @@ CREATE TABLE IF NOT EXISTS Departamentos (
     FOREIGN KEY (GerenteID) REFERENCES Funcionarios(FuncionarioID)
 );
                ''')
-criar_tabela('Departamentos', query)
+ESQUEMAS['Departamentos'] = query
 
 #Tabela HistoricoSalarios
 query = ('''
@@ -77,7 +248,7 @@ CREATE TABLE IF NOT EXISTS HistoricoSalarios (
     FOREIGN KEY (FuncionarioID) REFERENCES Funcionarios(FuncionarioID)
 );
                ''')
-criar_tabela('HistoricoSalarios', query)
+ESQUEMAS['HistoricoSalarios'] = query
 
 #Tabela Dependentes
 query = ('''
@@ -90,7 +261,7 @@ CREATE TABLE IF NOT EXISTS Dependentes (
     FOREIGN KEY (FuncionarioID) REFERENCES Funcionarios(FuncionarioID)
 );
                ''')
-criar_tabela('Dependentes', query)
+ESQUEMAS['Dependentes'] = query
 
 # Tabela Projetos
 query = (('''
@@ -106,7 +277,7 @@ CREATE TABLE IF NOT EXISTS Projetos (
     FOREIGN KEY (FuncionarioResponsavelID) REFERENCES Funcionarios(FuncionarioID)
 );
                 '''))
-criar_tabela('Projetos', query)
+ESQUEMAS['Projetos'] = query
 
 # Tabela RecursosProjetos
 query = (('''
@@ -120,14 +291,196 @@ CREATE TABLE IF NOT EXISTS RecursosProjetos (
     FOREIGN KEY (ProjetoID) REFERENCES Projetos(ProjetoID)
 );
             '''))
-criar_tabela('RecursosProjetos', query)
+ESQUEMAS['RecursosProjetos'] = query
 
 
 #Populando as tabelas criadas com arquivos CSV =======================================================================================
-def inserir_dados(nome_tabela, arquivo_csv):
+
+# Chave primária de cada tabela, usada para identificar linhas novas ou alteradas na ingestão incremental
+CHAVES_PRIMARIAS = {
+    'Funcionarios': 'FuncionarioID',
+    'Cargos': 'CargoID',
+    'Departamentos': 'DepartamentoID',
+    'HistoricoSalarios': 'HistoricoSalarioID',
+    'Dependentes': 'DependenteID',
+    'Projetos': 'ProjetoID',
+    'RecursosProjetos': 'RecursosProjetoID',
+}
+
+# Tabela de controle com a "impressão digital" (tamanho, data de modificação e hash) de cada CSV já carregado
+query = ('''
+CREATE TABLE IF NOT EXISTS ControleIngestao (
+    Arquivo TEXT PRIMARY KEY,
+    Tamanho INT,
+    Modificado REAL,
+    Hash TEXT
+);
+               ''')
+ESQUEMAS['ControleIngestao'] = query
+
+# Tabela de controle com um contador de versão por tabela, incrementado a cada carga que altera dados (usado pelo cache de consultas)
+query = ('''
+CREATE TABLE IF NOT EXISTS VersoesTabelas (
+    Tabela TEXT PRIMARY KEY,
+    Versao INT NOT NULL DEFAULT 0
+);
+               ''')
+ESQUEMAS['VersoesTabelas'] = query
+
+# Função para incrementar o contador de versão de uma tabela (deve ser chamada na mesma transação da alteração)
+def incrementar_versao_tabela(cursor, nome_tabela):
+    cursor.execute(
+        "INSERT INTO VersoesTabelas (Tabela, Versao) VALUES (?, 1) "
+        "ON CONFLICT (Tabela) DO UPDATE SET Versao = Versao + 1;",
+        (nome_tabela,),
+    )
+
+# Função para calcular o hash SHA-256 de um arquivo, lendo em blocos para não carregá-lo inteiro na memória
+def calcular_hash_arquivo(arquivo_csv):
+    import hashlib
+
+    sha = hashlib.sha256()
+    with open(arquivo_csv, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+# Função para verificar se o CSV mudou desde a última carga. Retorna (alterado, impressao_digital)
+def verificar_arquivo_alterado(cursor, arquivo_csv):
+    estatisticas = os.stat(arquivo_csv)
+    cursor.execute("SELECT Tamanho, Modificado, Hash FROM ControleIngestao WHERE Arquivo = ?;", (arquivo_csv,))
+    registro = cursor.fetchone()
+
+    # Mesmo tamanho e mesma data de modificação: nem é preciso calcular o hash
+    if registro and registro[0] == estatisticas.st_size and registro[1] == estatisticas.st_mtime:
+        return False, None
+
+    impressao_digital = (estatisticas.st_size, estatisticas.st_mtime, calcular_hash_arquivo(arquivo_csv))
+
+    # O arquivo foi tocado, mas o conteúdo é o mesmo
+    if registro and registro[2] == impressao_digital[2]:
+        return False, impressao_digital
+    return True, impressao_digital
+
+# Função para salvar a impressão digital do CSV na tabela de controle
+def registrar_impressao_digital(cursor, arquivo_csv, impressao_digital):
+    cursor.execute(
+        "INSERT OR REPLACE INTO ControleIngestao (Arquivo, Tamanho, Modificado, Hash) VALUES (?, ?, ?, ?);",
+        (arquivo_csv, *impressao_digital),
+    )
+
+# Função para garantir um índice único na chave (tabelas recriadas por to_sql perdem a PRIMARY KEY declarada). Tabelas que
+# ainda têm a PRIMARY KEY do esquema declarado já têm esse índice (sqlite_autoindex): um segundo índice igual é removido
+def garantir_indice_chave(cursor, nome_tabela):
+    chave = CHAVES_PRIMARIAS[nome_tabela]
+    indice = f'ux_{nome_tabela}_{chave}'
+    tem_chave_primaria = cursor.execute(
+        "SELECT 1 FROM pragma_table_info(?) WHERE pk > 0 LIMIT 1;", (nome_tabela,)
+    ).fetchone()
+    if tem_chave_primaria:
+        cursor.execute(f"DROP INDEX IF EXISTS {indice};")
+        return
+    if cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?;", (indice,)).fetchone():
+        return
+
+    # Tabelas gravadas pelo to_sql podem ter a mesma chave em mais de uma linha (versões antigas e novas de um registro):
+    # fica só a última gravada, para que o índice único possa ser criado
+    removidas = cursor.execute(
+        f"DELETE FROM {nome_tabela} WHERE {chave} IS NOT NULL AND rowid NOT IN "
+        f"(SELECT MAX(rowid) FROM {nome_tabela} WHERE {chave} IS NOT NULL GROUP BY {chave});"
+    ).rowcount
+    if removidas:
+        incrementar_versao_tabela(cursor, nome_tabela)
+        print(f"\nTabela {nome_tabela}: {removidas} linhas com {chave} repetida removidas (mantida a última versão).")
+        # Os resumos podem ter contado as linhas repetidas (a tabela regravada pelo to_sql pode estar sem gatilhos)
+        if nome_tabela in TABELAS_COM_RESUMO:
+            reconstruir_resumos(cursor)
+    cursor.execute(f"CREATE UNIQUE INDEX {indice} ON {nome_tabela} ({chave});")
+
+# Função para inserir ou atualizar apenas as linhas novas ou alteradas, comparando pela chave primária
+def aplicar_delta(cursor, nome_tabela, df_csv):
+    import pandas as pd
+    chave = CHAVES_PRIMARIAS[nome_tabela]
+    colunas = list(df_csv.columns)
+    demais_colunas = [coluna for coluna in colunas if coluna != chave]
+    posicao_chave = colunas.index(chave)
+
+    garantir_indice_chave(cursor, nome_tabela)
+
+    consulta_existente = f"SELECT {', '.join(colunas)} FROM {nome_tabela} WHERE {chave} = ?;"
+    query_insercao = f"INSERT INTO {nome_tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))});"
+    query_atualizacao = f"UPDATE {nome_tabela} SET {', '.join(f'{coluna} = ?' for coluna in demais_colunas)} WHERE {chave} = ?;"
+
+    # Se a mesma chave aparecer mais de uma vez no CSV, vale a última ocorrência
+    df_csv = df_csv.drop_duplicates(subset=chave, keep='last')
+
+    novas, alteradas, inalteradas = [], [], 0
+    for linha in df_csv.itertuples(index=False, name=None):
+        linha = tuple(None if pd.isna(valor) else valor for valor in linha)
+        cursor.execute(consulta_existente, (linha[posicao_chave],))
+        existente = cursor.fetchone()
+        if existente is None:
+            novas.append(linha)
+        elif existente != linha:
+            alteradas.append(tuple(valor for i, valor in enumerate(linha) if i != posicao_chave) + (linha[posicao_chave],))
+        else:
+            inalteradas += 1
+
+    cursor.executemany(query_insercao, novas)
+    cursor.executemany(query_atualizacao, alteradas)
+    return {'inseridas': len(novas), 'atualizadas': len(alteradas), 'inalteradas': inalteradas}
+
+# Ingestão incremental: pula CSVs que não mudaram e aplica somente o delta dos que mudaram
+def inserir_dados_incremental(nome_tabela, arquivo_csv):
+    conn = obter_conexao()
+    try:
+        cursor = conn.cursor()
+
+        alterado, impressao_digital = verificar_arquivo_alterado(cursor, arquivo_csv)
+        if not alterado:
+            if impressao_digital:
+                registrar_impressao_digital(cursor, arquivo_csv, impressao_digital)
+                conn.commit()
+            print(f"\nArquivo {arquivo_csv} não foi alterado. Tabela {nome_tabela} mantida.")
+            return {'inseridas': 0, 'atualizadas': 0, 'inalteradas': 0}
+
+        # O pandas só é importado quando o arquivo mudou: uma carga sem alterações não paga a importação
+        import pandas as pd
+        df_csv = pd.read_csv(arquivo_csv, delimiter=';', na_values='NULL')
+        contagem = aplicar_delta(cursor, nome_tabela, df_csv)
+        if contagem['inseridas'] or contagem['atualizadas']:
+            incrementar_versao_tabela(cursor, nome_tabela)
+
+        # A impressão digital só é registrada junto com os dados, na mesma transação
+        registrar_impressao_digital(cursor, arquivo_csv, impressao_digital)
+        conn.commit()
+
+        print(f"\nTabela {nome_tabela}: {contagem['inseridas']} linhas inseridas, "
+              f"{contagem['atualizadas']} atualizadas e {contagem['inalteradas']} inalteradas.")
+        return contagem
+
+    except Exception as e:
+        conn.rollback()
+        print(f"\nErro ao inserir dados na tabela {nome_tabela}: {e}")
+
+# Função de ingestão: modo incremental (delta por chave primária) ou completo (reescreve a tabela com to_sql)
+def inserir_dados(nome_tabela, arquivo_csv, incremental=False):
+    inicio = time.perf_counter()
+    if incremental:
+        contagem = inserir_dados_incremental(nome_tabela, arquivo_csv)
+        linhas = contagem['inseridas'] + contagem['atualizadas'] if contagem else None
+    else:
+        contagem = linhas = inserir_dados_completo(nome_tabela, arquivo_csv)
+    registrar_metrica('carga', nome_tabela, time.perf_counter() - inicio, linhas=linhas,
+                      arquivo=arquivo_csv, incremental=incremental)
+    return contagem
+
+# Ingestão completa: concatena a tabela com o CSV, remove duplicatas e reescreve tudo. Retorna o número de linhas novas
+def inserir_dados_completo(nome_tabela, arquivo_csv):
+    import pandas as pd
     try:
-        # Conectar ao banco de dados
-        conn = sqlite3.connect('DataDB.db')
+        # Obter a conexão compartilhada com o banco de dados
+        conn = obter_conexao()
 
         # Carregar dados do arquivo CSV para um DataFrame
         df_csv = pd.read_csv(arquivo_csv, delimiter=';', na_values='NULL')
@@ -138,8 +491,14 @@ def inserir_dados(nome_tabela, arquivo_csv):
         # Salvar o número de linhas antes da inserção
         linhas_antes = len(df_db)
 
-        # Concatenar os DataFrames e remover duplicatas
-        df = pd.concat([df_db, df_csv]).drop_duplicates()
+        # Linhas do CSV que são novas ou alteram uma linha existente
+        df_db = df_db.drop_duplicates()
+        linhas_alteradas = len(pd.concat([df_db, df_csv]).drop_duplicates()) - len(df_db)
+
+        # Concatenar os DataFrames e manter uma linha por chave primária: quando a chave se repete, fica a do CSV (a mais recente)
+        chave = CHAVES_PRIMARIAS[nome_tabela]
+        df = pd.concat([df_db, df_csv])
+        df = df[df[chave].isna() | ~df.duplicated(subset=[chave], keep='last')]
 
         # Salvar o número de linhas após a inserção
         linhas_depois = len(df)
@@ -147,118 +506,922 @@ def inserir_dados(nome_tabela, arquivo_csv):
         # Inserir dados na tabela do banco de dados usando to_sql
         df.to_sql(nome_tabela, conn, if_exists='replace', index=False)
 
-        # Se o número de linhas aumentou, imprimir a mensagem de sucesso
-        if linhas_depois > linhas_antes:
+        # O replace descarta os gatilhos da tabela: recriá-los e recalcular os resumos
+        if nome_tabela in TABELAS_COM_RESUMO:
+            preparar_resumos(reconstruir=True)
+
+        # Se alguma linha foi inserida ou alterada, invalidar o cache da tabela e imprimir a mensagem de sucesso
+        if linhas_alteradas > 0:
+            incrementar_versao_tabela(conn.cursor(), nome_tabela)
+            conn.commit()
             print(f"\nDados inseridos na tabela {nome_tabela} com sucesso!")
-        conn.close()
+        return linhas_depois - linhas_antes
 
     except Exception as e:
         print(f"\nErro ao inserir dados na tabela {nome_tabela}: {e}")
 
-# Inserir dados na tabela Funcionarios
-inserir_dados('Funcionarios', 'funcionarios.csv')
+#Tabelas de resumo ===================================================================================================================
 
-# Inserir dados na tabela Cargos
-inserir_dados('Cargos', 'cargos.csv')
+# Status considerado "concluído" nos agregados de projetos
+STATUS_CONCLUIDO = 'Concluído'
+
+# Resumo por departamento mantido por gatilhos: somas e contagens que permitem responder aos relatórios sem os joins completos
+query = ('''
+CREATE TABLE IF NOT EXISTS ResumoDepartamentos (
+    DepartamentoID INT PRIMARY KEY,
+    TotalFuncionarios INT NOT NULL DEFAULT 0,
+    SomaSalarios REAL NOT NULL DEFAULT 0,
+    ContagemSalarios INT NOT NULL DEFAULT 0,
+    TotalDependentes INT NOT NULL DEFAULT 0,
+    SomaIdadeDependentes INT NOT NULL DEFAULT 0,
+    ContagemIdadeDependentes INT NOT NULL DEFAULT 0,
+    ProjetosConcluidos INT NOT NULL DEFAULT 0,
+    SomaSalariosResponsaveis REAL NOT NULL DEFAULT 0,
+    ContagemSalariosResponsaveis INT NOT NULL DEFAULT 0,
+    CustoProjetosConcluidos REAL NOT NULL DEFAULT 0
+);
+               ''')
+ESQUEMAS['ResumoDepartamentos'] = query
+
+# Tabelas de origem de cada resumo (o cache de consultas invalida o resumo quando alguma delas muda)
+DEPENDENCIAS_RESUMOS = {
+    'ResumoDepartamentos': ['Funcionarios', 'Dependentes', 'Projetos'],
+    'SalariosAtuais': ['HistoricoSalarios'],
+    'ResumoRecursos': ['RecursosProjetos'],
+}
+
+# Contribuição de uma linha de cada tabela para o resumo; {r} é NEW ou OLD e {s} é +1 ou -1.
+# Cada linha só contribui quando o funcionário correspondente existe, e o funcionário, ao entrar, soma as linhas que já existiam,
+# então a ordem em que as tabelas são carregadas não altera o resultado.
+CONTRIBUICOES_RESUMO = {
+    'Funcionarios': """
+        INSERT OR IGNORE INTO ResumoDepartamentos (DepartamentoID) SELECT {r}.DepartamentoID WHERE {r}.DepartamentoID IS NOT NULL;
+        UPDATE ResumoDepartamentos SET
+            TotalFuncionarios = TotalFuncionarios + {s},
+            SomaSalarios = SomaSalarios + {s} * COALESCE({r}.Salario, 0),
+            ContagemSalarios = ContagemSalarios + {s} * ({r}.Salario IS NOT NULL),
+            TotalDependentes = TotalDependentes + {s} * (SELECT COUNT(*) FROM Dependentes WHERE FuncionarioID = {r}.FuncionarioID),
+            SomaIdadeDependentes = SomaIdadeDependentes + {s} * (SELECT COALESCE(SUM(Idade), 0) FROM Dependentes WHERE FuncionarioID = {r}.FuncionarioID),
+            ContagemIdadeDependentes = ContagemIdadeDependentes + {s} * (SELECT COUNT(Idade) FROM Dependentes WHERE FuncionarioID = {r}.FuncionarioID),
+            ProjetosConcluidos = ProjetosConcluidos + {s} * (SELECT COUNT(*) FROM Projetos WHERE FuncionarioResponsavelID = {r}.FuncionarioID AND Status = '{status}'),
+            SomaSalariosResponsaveis = SomaSalariosResponsaveis + {s} * COALESCE({r}.Salario, 0) * (SELECT COUNT(*) FROM Projetos WHERE FuncionarioResponsavelID = {r}.FuncionarioID AND Status = '{status}'),
+            ContagemSalariosResponsaveis = ContagemSalariosResponsaveis + {s} * ({r}.Salario IS NOT NULL) * (SELECT COUNT(*) FROM Projetos WHERE FuncionarioResponsavelID = {r}.FuncionarioID AND Status = '{status}'),
+            CustoProjetosConcluidos = CustoProjetosConcluidos + {s} * (SELECT COALESCE(SUM(Custo), 0) FROM Projetos WHERE FuncionarioResponsavelID = {r}.FuncionarioID AND Status = '{status}')
+        WHERE DepartamentoID = {r}.DepartamentoID;""",
+    'Dependentes': """
+        UPDATE ResumoDepartamentos SET
+            TotalDependentes = TotalDependentes + {s},
+            SomaIdadeDependentes = SomaIdadeDependentes + {s} * COALESCE({r}.Idade, 0),
+            ContagemIdadeDependentes = ContagemIdadeDependentes + {s} * ({r}.Idade IS NOT NULL)
+        WHERE DepartamentoID = (SELECT DepartamentoID FROM Funcionarios WHERE FuncionarioID = {r}.FuncionarioID);""",
+    'Projetos': """
+        UPDATE ResumoDepartamentos SET
+            ProjetosConcluidos = ProjetosConcluidos + {s},
+            SomaSalariosResponsaveis = SomaSalariosResponsaveis + {s} * (SELECT COALESCE(Salario, 0) FROM Funcionarios WHERE FuncionarioID = {r}.FuncionarioResponsavelID),
+            ContagemSalariosResponsaveis = ContagemSalariosResponsaveis + {s} * (SELECT Salario IS NOT NULL FROM Funcionarios WHERE FuncionarioID = {r}.FuncionarioResponsavelID),
+            CustoProjetosConcluidos = CustoProjetosConcluidos + {s} * COALESCE({r}.Custo, 0)
+        WHERE {r}.Status = '{status}'
+          AND DepartamentoID = (SELECT DepartamentoID FROM Funcionarios WHERE FuncionarioID = {r}.FuncionarioResponsavelID);""",
+}
+
+# Recálculo completo do resumo, usado na criação e depois de cargas que recriam as tabelas de origem
+QUERY_RECONSTRUIR_RESUMO = f"""
+    INSERT INTO ResumoDepartamentos
+    SELECT f.DepartamentoID,
+           COUNT(*),
+           SUM(COALESCE(f.Salario, 0)),
+           SUM(f.Salario IS NOT NULL),
+           COALESCE(SUM(dep.Total), 0),
+           COALESCE(SUM(dep.SomaIdade), 0),
+           COALESCE(SUM(dep.ContagemIdade), 0),
+           COALESCE(SUM(p.Total), 0),
+           COALESCE(SUM(COALESCE(f.Salario, 0) * p.Total), 0),
+           COALESCE(SUM((f.Salario IS NOT NULL) * p.Total), 0),
+           COALESCE(SUM(p.Custo), 0)
+    FROM Funcionarios f
+    LEFT JOIN (
+        SELECT FuncionarioID, COUNT(*) AS Total, COALESCE(SUM(Idade), 0) AS SomaIdade, COUNT(Idade) AS ContagemIdade
+        FROM Dependentes GROUP BY FuncionarioID
+    ) dep ON dep.FuncionarioID = f.FuncionarioID
+    LEFT JOIN (
+        SELECT FuncionarioResponsavelID, COUNT(*) AS Total, COALESCE(SUM(Custo), 0) AS Custo
+        FROM Projetos WHERE Status = '{STATUS_CONCLUIDO}' GROUP BY FuncionarioResponsavelID
+    ) p ON p.FuncionarioResponsavelID = f.FuncionarioID
+    WHERE f.DepartamentoID IS NOT NULL
+    GROUP BY f.DepartamentoID;
+"""
+
+# Salário atual e última alteração de cada funcionário, para que as consultas de aumentos recentes não releiam o histórico inteiro
+query = ('''
+CREATE TABLE IF NOT EXISTS SalariosAtuais (
+    FuncionarioID INT PRIMARY KEY,
+    SalarioAtual REAL,
+    DataSalarioAtual DATE,
+    SalarioAnterior REAL,
+    DataUltimaAlteracao DATE,
+    ValorUltimoAumento REAL,
+    DataUltimoAumento DATE
+);
+               ''')
+ESQUEMAS['SalariosAtuais'] = query
+
+# Histórico de cada funcionário em ordem: salário anterior (LAG) e posição contada a partir do registro mais recente
+HISTORICO_ORDENADO = """
+    SELECT FuncionarioID, Data, Salario,
+           LAG(Salario) OVER (PARTITION BY FuncionarioID ORDER BY Data, HistoricoSalarioID) AS SalarioAnterior,
+           ROW_NUMBER() OVER (PARTITION BY FuncionarioID ORDER BY Data DESC, HistoricoSalarioID DESC) AS Recencia
+    FROM HistoricoSalarios {filtro}
+"""
+
+# Alterações de salário, numeradas da mais recente para a mais antiga (no geral e separando aumentos de reduções)
+ALTERACOES_ORDENADAS = f"""
+    SELECT *,
+           ROW_NUMBER() OVER (PARTITION BY FuncionarioID ORDER BY Recencia) AS RecenciaAlteracao,
+           ROW_NUMBER() OVER (PARTITION BY FuncionarioID, Salario > SalarioAnterior ORDER BY Recencia) AS RecenciaTipo
+    FROM ({HISTORICO_ORDENADO}) WHERE Salario != SalarioAnterior
+"""
+
+# Cálculo das linhas de SalariosAtuais em uma única passada pelo histórico ordenado, sem junções (o plano não depende das
+# estatísticas do ANALYZE). Cada alteração e cada aumento é numerado a partir do mais recente, e o agrupamento por funcionário
+# pega o registro atual, a última alteração e o último aumento. {filtro} restringe o histórico lido (gatilhos não aceitam WITH)
+QUERY_SALARIOS_ATUAIS = f"""
+    INSERT INTO SalariosAtuais
+    SELECT FuncionarioID,
+           MAX(CASE WHEN Recencia = 1 THEN Salario END),
+           MAX(CASE WHEN Recencia = 1 THEN Data END),
+           MAX(CASE WHEN Alteracao AND RecenciaAlteracao = 1 THEN SalarioAnterior END),
+           MAX(CASE WHEN Alteracao AND RecenciaAlteracao = 1 THEN Data END),
+           MAX(CASE WHEN Aumento AND RecenciaAumento = 1 THEN Salario - SalarioAnterior END),
+           MAX(CASE WHEN Aumento AND RecenciaAumento = 1 THEN Data END)
+    FROM (
+        SELECT *, Salario != SalarioAnterior AS Alteracao, Salario > SalarioAnterior AS Aumento,
+               ROW_NUMBER() OVER (PARTITION BY FuncionarioID, Salario != SalarioAnterior ORDER BY Recencia) AS RecenciaAlteracao,
+               ROW_NUMBER() OVER (PARTITION BY FuncionarioID, Salario > SalarioAnterior ORDER BY Recencia) AS RecenciaAumento
+        FROM ({HISTORICO_ORDENADO})
+    )
+    GROUP BY FuncionarioID;
+"""
+
+# Resumos recalculados por funcionário a cada alteração da tabela de origem; {r} é NEW ou OLD
+RECALCULOS_RESUMO = {
+    'HistoricoSalarios': "DELETE FROM SalariosAtuais WHERE FuncionarioID = {r}.FuncionarioID;"
+                         + QUERY_SALARIOS_ATUAIS.format(filtro='WHERE FuncionarioID = {r}.FuncionarioID'),
+}
+
+# Uso de recursos agregado por tipo, descrição, projeto e mês, para que os top-K por fatia leiam só este resumo.
+# Sem chave primária declarada: as colunas podem ser nulas e o gatilho compara com IS para manter uma linha por combinação.
+# QuantidadesInformadas conta as quantidades não nulas: sem nenhuma, o total lido é NULL, como no SUM sobre RecursosProjetos
+query = ('''
+CREATE TABLE IF NOT EXISTS ResumoRecursos (
+    TipoRecurso TEXT,
+    DescricaoRecurso TEXT,
+    ProjetoID INT,
+    Mes TEXT,
+    QuantidadeTotal INTEGER NOT NULL DEFAULT 0,
+    Utilizacoes INTEGER NOT NULL DEFAULT 0,
+    QuantidadesInformadas INTEGER NOT NULL DEFAULT 0
+);
+               ''')
+ESQUEMAS['ResumoRecursos'] = query
+
+# Linha do resumo correspondente a uma linha de RecursosProjetos ({r} é NEW ou OLD)
+CHAVE_RESUMO_RECURSOS = """TipoRecurso IS {r}.TipoRecurso AND DescricaoRecurso IS {r}.DescricaoRecurso
+          AND ProjetoID IS {r}.ProjetoID AND Mes IS strftime('%Y-%m', {r}.DataUtilizacao)"""
+
+CONTRIBUICOES_RESUMO['RecursosProjetos'] = f"""
+        INSERT INTO ResumoRecursos (TipoRecurso, DescricaoRecurso, ProjetoID, Mes)
+        SELECT {{r}}.TipoRecurso, {{r}}.DescricaoRecurso, {{r}}.ProjetoID, strftime('%Y-%m', {{r}}.DataUtilizacao)
+        WHERE NOT EXISTS (SELECT 1 FROM ResumoRecursos WHERE {CHAVE_RESUMO_RECURSOS});
+        UPDATE ResumoRecursos SET
+            QuantidadeTotal = QuantidadeTotal + {{s}} * COALESCE({{r}}.QuantidadeRecurso, 0),
+            Utilizacoes = Utilizacoes + {{s}},
+            QuantidadesInformadas = QuantidadesInformadas + {{s}} * ({{r}}.QuantidadeRecurso IS NOT NULL)
+        WHERE {CHAVE_RESUMO_RECURSOS};
+        DELETE FROM ResumoRecursos WHERE Utilizacoes = 0 AND {CHAVE_RESUMO_RECURSOS};"""
+
+# Recálculo completo do resumo de recursos
+QUERY_RECONSTRUIR_RESUMO_RECURSOS = """
+    INSERT INTO ResumoRecursos
+    SELECT TipoRecurso, DescricaoRecurso, ProjetoID, strftime('%Y-%m', DataUtilizacao), SUM(COALESCE(QuantidadeRecurso, 0)), COUNT(*),
+           COUNT(QuantidadeRecurso)
+    FROM RecursosProjetos
+    GROUP BY 1, 2, 3, 4;
+"""
+
+# Total de uso lido do resumo em uma agregação: NULL quando nenhuma utilização do grupo informou a quantidade
+TOTAL_RESUMO_RECURSOS = "CASE WHEN SUM(QuantidadesInformadas) > 0 THEN SUM(QuantidadeTotal) END"
+
+# Tabelas de origem que têm gatilhos de resumo
+TABELAS_COM_RESUMO = [*CONTRIBUICOES_RESUMO, *RECALCULOS_RESUMO]
+
+# Função para remover os gatilhos do resumo (a carga em massa os remove e reconstrói o resumo no final)
+def remover_gatilhos_resumo(cursor):
+    for nome_tabela in TABELAS_COM_RESUMO:
+        for evento in ('INSERT', 'DELETE', 'UPDATE'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS trg_resumo_{nome_tabela}_{evento.lower()};")
+
+# Função para montar o corpo dos gatilhos de cada tabela de origem, por evento
+def corpos_gatilhos_resumo():
+    for nome_tabela, contribuicao in CONTRIBUICOES_RESUMO.items():
+        retirar = contribuicao.format(r='OLD', s='-1', status=STATUS_CONCLUIDO)
+        somar = contribuicao.format(r='NEW', s='+1', status=STATUS_CONCLUIDO)
+        yield nome_tabela, (('INSERT', somar), ('DELETE', retirar), ('UPDATE', retirar + somar))
+    for nome_tabela, recalculo in RECALCULOS_RESUMO.items():
+        antigo, novo = recalculo.format(r='OLD'), recalculo.format(r='NEW')
+        yield nome_tabela, (('INSERT', novo), ('DELETE', antigo), ('UPDATE', antigo + novo))
+
+# Função para criar os gatilhos que mantêm os resumos a cada alteração
+def criar_gatilhos_resumo(cursor):
+    for nome_tabela, eventos in corpos_gatilhos_resumo():
+        for evento, corpo in eventos:
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS trg_resumo_{nome_tabela}_{evento.lower()} "
+                f"AFTER {evento} ON {nome_tabela} BEGIN {corpo} END;"
+            )
+
+# Função para recalcular o resumo do zero
+def reconstruir_resumo_departamentos(cursor):
+    cursor.execute("DELETE FROM ResumoDepartamentos;")
+    cursor.execute(QUERY_RECONSTRUIR_RESUMO)
+    incrementar_versao_tabela(cursor, 'ResumoDepartamentos')
+
+# Função para recalcular os salários atuais de todos os funcionários
+def reconstruir_salarios_atuais(cursor):
+    cursor.execute("DELETE FROM SalariosAtuais;")
+    cursor.execute(QUERY_SALARIOS_ATUAIS.format(filtro='WHERE FuncionarioID IS NOT NULL'))
+    incrementar_versao_tabela(cursor, 'SalariosAtuais')
+
+# Função para recalcular o resumo de uso dos recursos
+def reconstruir_resumo_recursos(cursor):
+    cursor.execute("DELETE FROM ResumoRecursos;")
+    cursor.execute(QUERY_RECONSTRUIR_RESUMO_RECURSOS)
+    incrementar_versao_tabela(cursor, 'ResumoRecursos')
+
+# Função para recalcular todas as tabelas de resumo
+def reconstruir_resumos(cursor):
+    reconstruir_resumo_departamentos(cursor)
+    reconstruir_salarios_atuais(cursor)
+    reconstruir_resumo_recursos(cursor)
+
+# Colunas acrescentadas às tabelas de resumo depois da sua criação, com a definição usada para incluí-las nos bancos antigos
+COLUNAS_NOVAS_RESUMOS = {
+    'ResumoRecursos': {'QuantidadesInformadas': 'INTEGER NOT NULL DEFAULT 0'},
+}
+
+# Função para incluir nas tabelas de resumo já existentes as colunas que faltam; retorna se alguma coluna foi incluída
+def atualizar_colunas_resumos(cursor):
+    incluidas = False
+    for nome_tabela, colunas in COLUNAS_NOVAS_RESUMOS.items():
+        existentes = {coluna[1] for coluna in cursor.execute(f"PRAGMA table_info({nome_tabela});")}
+        for coluna, definicao in colunas.items():
+            if existentes and coluna not in existentes:
+                cursor.execute(f"ALTER TABLE {nome_tabela} ADD COLUMN {coluna} {definicao};")
+                incluidas = True
+    return incluidas
+
+# Função para garantir que os gatilhos existem; os resumos são recalculados quando pedido ou quando algum gatilho estava faltando
+def preparar_resumos(reconstruir=False):
+    conn = obter_conexao()
+    try:
+        cursor = conn.cursor()
+        # Os gatilhos antigos não preenchem as colunas novas: são removidos, para serem recriados com o resumo recalculado
+        if atualizar_colunas_resumos(cursor):
+            remover_gatilhos_resumo(cursor)
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_resumo_%';")
+        if cursor.fetchone()[0] < 3 * len(TABELAS_COM_RESUMO):
+            reconstruir = True
+        criar_gatilhos_resumo(cursor)
+        if reconstruir:
+            reconstruir_resumos(cursor)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"\nErro ao preparar as tabelas de resumo: {e}")
+
+#Carga em massa ========================================================================================================================
+
+# Ordem de carga respeitando as chaves estrangeiras: dimensões primeiro, depois fatos que dependem delas
+ORDEM_CARGA = [
+    ('Cargos', 'cargos.csv'),
+    ('Departamentos', 'departamento.csv'),
+    ('Funcionarios', 'funcionarios.csv'),
+    ('Dependentes', 'dependentes.csv'),
+    ('HistoricoSalarios', 'historico_salarios.csv'),
+    ('Projetos', 'projetos.csv'),
+    ('RecursosProjetos', 'recursos_projetos.csv'),
+]
+
+# Pragmas relaxados durante a carga; os valores anteriores são restaurados ao final
+PRAGMAS_CARGA = {
+    'journal_mode': 'MEMORY',
+    'synchronous': 'OFF',
+    'temp_store': 'MEMORY',
+    'cache_size': -200000,
+}
+
+# Marcadores de valor ausente, os mesmos que o pd.read_csv reconhece por padrão (comparados sem diferenciar maiúsculas),
+# para que a carga em massa grave os mesmos dados que a carga incremental
+VALORES_NULOS = {
+    '', '#n/a', '#n/a n/a', '#na', '-1.#ind', '-1.#qnan', '-nan', '1.#ind', '1.#qnan', '<na>', 'n/a', 'na', 'nan', 'null', 'none',
+}
+
+# Função para ler um CSV em lotes de tamanho fixo, sem materializar o arquivo inteiro na memória
+def ler_csv_em_lotes(arquivo_csv, tamanho_lote):
+    with open(arquivo_csv, newline='', encoding='utf-8') as f:
+        leitor = csv.reader(f, delimiter=';')
+        cabecalho = next(leitor)
+        lote = []
+        for linha in leitor:
+            # Linhas em branco são puladas, como no pd.read_csv
+            if not linha:
+                continue
+            # Valores vazios ou marcadores como 'NULL'/'null' viram NULL; a afinidade de tipo das colunas converte o restante
+            lote.append(tuple(None if valor.strip().lower() in VALORES_NULOS else valor for valor in linha))
+            if len(lote) >= tamanho_lote:
+                yield cabecalho, lote
+                lote = []
+        if lote:
+            yield cabecalho, lote
+
+# Função para carregar um único CSV em uma tabela, dentro de uma única transação
+def carregar_tabela_em_massa(cursor, nome_tabela, arquivo_csv, tamanho_lote, recriar):
+    if recriar:
+        cursor.execute(f"DROP TABLE IF EXISTS {nome_tabela};")
+        cursor.execute(ESQUEMAS[nome_tabela])
+    else:
+        garantir_indice_chave(cursor, nome_tabela)
+
+    total = 0
+    for cabecalho, lote in ler_csv_em_lotes(arquivo_csv, tamanho_lote):
+        query = f"INSERT OR REPLACE INTO {nome_tabela} ({', '.join(cabecalho)}) VALUES ({', '.join('?' * len(cabecalho))});"
+        cursor.executemany(query, lote)
+        total += len(lote)
+    return total
+
+# Carga em massa dos CSVs: leitura em lotes, executemany e uma transação por tabela, com pragmas relaxados
+def carregar_em_massa(arquivos=ORDEM_CARGA, tamanho_lote=50000, recriar=False):
+    # A carga usa uma conexão exclusiva: as compartilhadas são fechadas para que o journal_mode possa ser alterado
+    fechar_conexoes()
+    conn = sqlite3.connect(CAMINHO_BANCO, isolation_level=None)
+    cursor = conn.cursor()
 
-# Inserir dados na tabela Departamentos
-inserir_dados('Departamentos', 'departamento.csv')
+    # Guardar os pragmas atuais e relaxá-los durante a carga
+    pragmas_originais = {nome: cursor.execute(f"PRAGMA {nome};").fetchone()[0] for nome in PRAGMAS_CARGA}
+    for nome, valor in PRAGMAS_CARGA.items():
+        cursor.execute(f"PRAGMA {nome} = {valor};")
 
-# Inserir dados na tabela HistoricoSalarios
-inserir_dados('HistoricoSalarios', 'historico_salarios.csv')
+    # Os gatilhos do resumo ficam desligados durante a carga; o resumo é recalculado uma única vez no final
+    remover_gatilhos_resumo(cursor)
 
-# Inserir dados na tabela Dependentes
-inserir_dados('Dependentes', 'dependentes.csv')
+    totais = {}
+    try:
+        for nome_tabela, arquivo_csv in arquivos:
+            try:
+                cursor.execute("BEGIN;")
+                inicio = time.perf_counter()
+                totais[nome_tabela] = carregar_tabela_em_massa(cursor, nome_tabela, arquivo_csv, tamanho_lote, recriar)
+                incrementar_versao_tabela(cursor, nome_tabela)
+
+                # Registrar a impressão digital para que a ingestão incremental saiba que o arquivo já foi carregado
+                estatisticas = os.stat(arquivo_csv)
+                registrar_impressao_digital(
+                    cursor, arquivo_csv, (estatisticas.st_size, estatisticas.st_mtime, calcular_hash_arquivo(arquivo_csv))
+                )
+                cursor.execute("COMMIT;")
+                registrar_metrica('carga_em_massa', nome_tabela, time.perf_counter() - inicio,
+                                  linhas=totais[nome_tabela], arquivo=arquivo_csv)
+                print(f"\nTabela {nome_tabela}: {totais[nome_tabela]} linhas carregadas em massa.")
+            except Exception as e:
+                cursor.execute("ROLLBACK;")
+                print(f"\nErro na carga em massa da tabela {nome_tabela}: {e}")
+    finally:
+        try:
+            cursor.execute("BEGIN;")
+            criar_gatilhos_resumo(cursor)
+            reconstruir_resumos(cursor)
+            cursor.execute("COMMIT;")
+        finally:
+            # Os pragmas são restaurados mesmo se a reconstrução falhar, para o banco não ficar fora do modo WAL.
+            # Sem os gatilhos, preparar_resumos os recria e reconstrói os resumos na próxima execução
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK;")
+            for nome, valor in pragmas_originais.items():
+                cursor.execute(f"PRAGMA {nome} = {valor};")
+            conn.close()
+    return totais
+
+
+#Índices secundários =================================================================================================================
+
+# Índices usados pelos joins e filtros dos relatórios; os que incluem as colunas lidas pela consulta são cobrindo (covering)
+INDICES = {
+    'ix_Funcionarios_DepartamentoID': "CREATE INDEX IF NOT EXISTS ix_Funcionarios_DepartamentoID ON Funcionarios (DepartamentoID, Salario);",
+    'ix_Funcionarios_CargoID': "CREATE INDEX IF NOT EXISTS ix_Funcionarios_CargoID ON Funcionarios (CargoID);",
+    'ix_Dependentes_FuncionarioID': "CREATE INDEX IF NOT EXISTS ix_Dependentes_FuncionarioID ON Dependentes (FuncionarioID, Idade, DependenteID);",
+    'ix_Projetos_FuncionarioResponsavelID': "CREATE INDEX IF NOT EXISTS ix_Projetos_FuncionarioResponsavelID ON Projetos (FuncionarioResponsavelID);",
+    'ix_Projetos_Status': "CREATE INDEX IF NOT EXISTS ix_Projetos_Status ON Projetos (Status, FuncionarioResponsavelID, Custo);",
+    'ix_HistoricoSalarios_FuncionarioID_Data_ID': "CREATE INDEX IF NOT EXISTS ix_HistoricoSalarios_FuncionarioID_Data_ID ON HistoricoSalarios (FuncionarioID, Data, HistoricoSalarioID, Salario);",
+    'ix_SalariosAtuais_DataUltimoAumento': "CREATE INDEX IF NOT EXISTS ix_SalariosAtuais_DataUltimoAumento ON SalariosAtuais (DataUltimoAumento, FuncionarioID, ValorUltimoAumento);",
+    'ix_ResumoRecursos_Chave_Quantidades': "CREATE INDEX IF NOT EXISTS ix_ResumoRecursos_Chave_Quantidades ON ResumoRecursos (TipoRecurso, DescricaoRecurso, ProjetoID, Mes, QuantidadeTotal, QuantidadesInformadas);",
+}
+
+# Índices substituídos por outros da lista acima, removidos dos bancos antigos
+INDICES_OBSOLETOS = ['ix_HistoricoSalarios_FuncionarioID_Data', 'ix_RecursosProjetos_Tipo_Descricao', 'ix_ResumoRecursos_Chave']
+
+# Função para criar os índices que ainda não existem e atualizar as estatísticas usadas pelo planejador de consultas
+def criar_indices():
+    conn = obter_conexao()
+    cursor = conn.cursor()
 
-#Inserir dados na tabela Projetos
-inserir_dados('Projetos', 'projetos.csv')
+    # Cada índice é criado em um savepoint próprio: uma falha é informada e desfeita sem impedir os demais nem o ANALYZE.
+    # Os índices únicos das chaves vêm primeiro (to_sql com replace os remove), já que removem as linhas repetidas
+    etapas = [(f"chave de {nome_tabela}", partial(garantir_indice_chave, cursor, nome_tabela)) for nome_tabela in CHAVES_PRIMARIAS]
+    etapas += [(nome_indice, partial(cursor.execute, f"DROP INDEX IF EXISTS {nome_indice};")) for nome_indice in INDICES_OBSOLETOS]
+    etapas += [(nome_indice, partial(cursor.execute, query)) for nome_indice, query in INDICES.items()]
+    for nome_indice, etapa in etapas:
+        cursor.execute("SAVEPOINT indice;")
+        try:
+            etapa()
+            cursor.execute("RELEASE indice;")
+        except sqlite3.Error as e:
+            cursor.execute("ROLLBACK TO indice;")
+            cursor.execute("RELEASE indice;")
+            print(f"\nErro ao criar o índice {nome_indice}: {e}")
 
-#Inserir dados na tabela RecursosProjetos
-inserir_dados('RecursosProjetos', 'recursos_projetos.csv')
+    try:
+        cursor.execute("ANALYZE;")
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"\nErro ao atualizar as estatísticas dos índices: {e}")
 
 #Consultas SQL ==========================================================================================================================
 
-# Função para conectar ao banco de dados e executar uma consulta SQL
-def executar_consulta_sql(query):
-    conn = sqlite3.connect('DataDB.db')
+# Janela padrão, em meses, das consultas de aumentos salariais
+JANELA_AUMENTOS_MESES = 3
+
+# Consultas SQL dos relatórios, registradas por nome para que possam ser analisadas (EXPLAIN QUERY PLAN) e reutilizadas.
+# Os filtros são parâmetros nomeados (:status, :limite...): o texto SQL não muda entre chamadas, então o sqlite3 reaproveita
+# o comando já compilado (cached_statements) em vez de recompilá-lo para cada valor
+CONSULTAS_RELATORIOS = {
+    'listar_funcionarios_com_info': """
+        SELECT f.Nome AS Funcionario, c.Descricao AS Cargo, d.NomeDepartamento, dep.Nome AS Dependente
+        FROM Funcionarios f
+        JOIN Cargos c ON f.CargoID = c.CargoID
+        JOIN Departamentos d ON f.DepartamentoID = d.DepartamentoID
+        LEFT JOIN Dependentes dep ON f.FuncionarioID = dep.FuncionarioID;
+    """,
+    'listar_funcionarios_com_aumento': """
+        SELECT f.Nome, s.DataUltimoAumento AS DataAumento, s.ValorUltimoAumento AS Aumento
+        FROM SalariosAtuais s
+        JOIN Funcionarios f ON f.FuncionarioID = s.FuncionarioID
+        WHERE s.DataUltimoAumento > date(:referencia, :janela) AND s.DataUltimoAumento <= :referencia
+        ORDER BY f.Nome;
+    """,
+    'listar_alteracoes_salariais': """
+        SELECT h.FuncionarioID, f.Nome, h.Data, h.SalarioAnterior, h.Salario, h.Salario - h.SalarioAnterior AS Variacao
+        FROM (
+            SELECT FuncionarioID, HistoricoSalarioID, Data, Salario,
+                   LAG(Salario) OVER (PARTITION BY FuncionarioID ORDER BY Data, HistoricoSalarioID) AS SalarioAnterior
+            FROM HistoricoSalarios
+        ) h
+        JOIN Funcionarios f ON f.FuncionarioID = h.FuncionarioID
+        WHERE h.Salario != h.SalarioAnterior AND h.Data > date(:referencia, :janela) AND h.Data <= :referencia
+        ORDER BY h.FuncionarioID, h.Data, h.HistoricoSalarioID;
+    """,
+    'data_referencia_salarios': """
+        SELECT MAX(DataSalarioAtual) AS Data FROM SalariosAtuais;
+    """,
+    'listar_media_idade_filhos_por_departamento': """
+        SELECT d.NomeDepartamento, ROUND(CAST(r.SomaIdadeDependentes AS REAL) / r.ContagemIdadeDependentes) AS MediaIdade
+        FROM ResumoDepartamentos r
+        JOIN Departamentos d ON d.DepartamentoID = r.DepartamentoID
+        WHERE r.TotalDependentes > 0
+        ORDER BY d.NomeDepartamento;
+    """,
+    'listar_estagiarios_com_filho': """
+        SELECT DISTINCT f.Nome
+        FROM Funcionarios f
+        JOIN Cargos c ON f.CargoID = c.CargoID
+        JOIN Dependentes dep ON f.FuncionarioID = dep.FuncionarioID
+        WHERE c.Descricao = :cargo;
+    """,
+    'listar_media_salarios_funcionarios_projetos_concluidos': """
+        SELECT d.NomeDepartamento AS Departamento, r.SomaSalariosResponsaveis / r.ContagemSalariosResponsaveis AS MediaSalarios
+        FROM ResumoDepartamentos r
+        JOIN Departamentos d ON d.DepartamentoID = r.DepartamentoID
+        WHERE r.ProjetosConcluidos > 0
+        ORDER BY d.NomeDepartamento;
+    """,
+    'listar_recursos_mais_utilizados': f"""
+        SELECT DescricaoRecurso, {TOTAL_RESUMO_RECURSOS} AS TotalUtilizado
+        FROM ResumoRecursos
+        WHERE TipoRecurso = :tipo_recurso
+        GROUP BY DescricaoRecurso
+        ORDER BY TotalUtilizado DESC, DescricaoRecurso
+        LIMIT :limite;
+    """,
+    'listar_custo_total_projetos_concluidos_por_departamento': """
+        SELECT d.NomeDepartamento AS Departamento, r.CustoProjetosConcluidos AS CustoTotal
+        FROM ResumoDepartamentos r
+        JOIN Departamentos d ON d.DepartamentoID = r.DepartamentoID
+        WHERE r.ProjetosConcluidos > 0
+        ORDER BY d.NomeDepartamento;
+    """,
+    'listar_projetos_em_execucao': """
+        SELECT p.NomeProjeto, p.Custo, p.DataInicio, p.DataConclusao, f.Nome AS FuncionarioResponsavel
+        FROM Projetos p
+        JOIN Funcionarios f ON p.FuncionarioResponsavelID = f.FuncionarioID
+        WHERE p.Status = :status;
+    """,
+    'listar_projeto_maior_numero_dependentes': """
+        SELECT p.NomeProjeto, COUNT(dep.DependenteID) AS NumeroDependentes
+        FROM Projetos p
+        JOIN Funcionarios f ON p.FuncionarioResponsavelID = f.FuncionarioID
+        JOIN Dependentes dep ON f.FuncionarioID = dep.FuncionarioID
+        GROUP BY p.NomeProjeto
+        ORDER BY NumeroDependentes DESC, p.NomeProjeto
+        LIMIT :limite;
+    """,
+    'listar_departamento_mais_dependentes': """
+        SELECT d.NomeDepartamento, r.TotalDependentes
+        FROM ResumoDepartamentos r
+        JOIN Departamentos d ON d.DepartamentoID = r.DepartamentoID
+        ORDER BY r.TotalDependentes DESC, d.NomeDepartamento
+        LIMIT :limite;
+    """,
+    'listar_media_salarial_por_departamento': """
+        SELECT d.NomeDepartamento AS Departamento, r.SomaSalarios / r.ContagemSalarios AS MediaSalarial
+        FROM ResumoDepartamentos r
+        JOIN Departamentos d ON d.DepartamentoID = r.DepartamentoID
+        WHERE r.ContagemSalarios > 0
+        ORDER BY MediaSalarial DESC;
+    """,
+}
+
+# Valores padrão dos parâmetros de cada consulta registrada (a referência das janelas de salário é a data mais recente do histórico).
+# Os filtros de projetos concluídos não aparecem aqui: ficam no resumo por departamento (STATUS_CONCLUIDO)
+PARAMETROS_CONSULTAS = {
+    'listar_funcionarios_com_aumento': {'referencia': None, 'janela': f'-{JANELA_AUMENTOS_MESES} months'},
+    'listar_alteracoes_salariais': {'referencia': None, 'janela': f'-{JANELA_AUMENTOS_MESES} months'},
+    'listar_estagiarios_com_filho': {'cargo': 'Estagiário'},
+    'listar_recursos_mais_utilizados': {'tipo_recurso': 'Material', 'limite': 3},
+    'listar_projetos_em_execucao': {'status': 'Em Execução'},
+    'listar_projeto_maior_numero_dependentes': {'limite': 1},
+    'listar_departamento_mais_dependentes': {'limite': 1},
+}
+
+# Função para montar os parâmetros de uma consulta registrada: os padrões, substituídos pelos valores informados
+def parametros_consulta(nome, **parametros):
+    padroes = PARAMETROS_CONSULTAS.get(nome, {})
+    desconhecidos = set(parametros) - set(padroes)
+    if desconhecidos:
+        raise ValueError(f"Parâmetros desconhecidos para a consulta {nome}: {', '.join(sorted(desconhecidos))}")
+    return {**padroes, **parametros}
+
+# Função para executar uma consulta registrada pelo nome, com parâmetros vinculados (bound)
+def executar_consulta(nome, usar_cache=True, **parametros):
+    return executar_consulta_sql(CONSULTAS_RELATORIOS[nome], parametros_consulta(nome, **parametros), usar_cache)
+
+# Função para percorrer o resultado de uma consulta registrada sem materializá-lo
+def iterar_consulta(nome, **parametros):
+    return iterar_consulta_sql(CONSULTAS_RELATORIOS[nome], parametros_consulta(nome, **parametros))
+
+# Função para transformar os parâmetros (sequência ou dicionário de parâmetros nomeados) em uma chave imutável
+def chave_parametros(parametros):
+    if isinstance(parametros, dict):
+        return tuple(sorted(parametros.items()))
+    return tuple(parametros)
+
+# Função geradora que executa uma consulta SQL e devolve as linhas aos poucos, em lotes de fetchmany
+def iterar_consulta_sql(query, parametros=(), tamanho_lote=1000):
+    conn = obter_conexao(somente_leitura=True)
     cursor = conn.cursor()
-    cursor.execute(query)
-    resultados = cursor.fetchall()
-    colunas = [description[0] for description in cursor.description]
-    conn.close()
-    return [dict(zip(colunas, linha)) for linha in resultados]
+    nome = nome_da_consulta(query)
+    linhas = 0
+    inicio = time.perf_counter()
+    try:
+        cursor.execute(query, parametros)
+        colunas = [description[0] for description in cursor.description]
+        while True:
+            lote = cursor.fetchmany(tamanho_lote)
+            if not lote:
+                break
+            linhas += len(lote)
+            for linha in lote:
+                yield dict(zip(colunas, linha))
+    finally:
+        cursor.close()
+        # O tempo vai da execução até a última linha lida (inclui o consumo das linhas, quando em fluxo)
+        registrar_metrica('consulta', nome, time.perf_counter() - inicio, linhas=linhas,
+                          plano=plano_para_metricas(nome, query, parametros),
+                          parametros=dict(parametros) if isinstance(parametros, dict) else list(parametros))
+
+# Função para identificar a consulta nas métricas: o nome no registro de consultas ou o início do texto SQL
+def nome_da_consulta(query):
+    for nome, texto in CONSULTAS_RELATORIOS.items():
+        if texto == query:
+            return nome
+    return ' '.join(query.split())[:80]
+
+# Função para obter o plano de execução uma única vez por consulta, para anexá-lo às métricas
+def plano_para_metricas(nome, query, parametros=()):
+    if nome not in _planos_metricas:
+        try:
+            return obter_plano_consulta(query, parametros)
+        except sqlite3.Error:
+            return None
+    return _planos_metricas[nome]
+
+#Cache de resultados das consultas ===================================================================================================
+
+# Número máximo de resultados guardados; ao passar do limite, o menos usado recentemente é descartado (LRU)
+TAMANHO_MAXIMO_CACHE = 128
+
+_cache_consultas = OrderedDict()
+_trava_cache = threading.Lock()
+_estatisticas_cache = {'acertos': 0, 'falhas': 0, 'descartes': 0, 'invalidacoes': 0}
+
+# Função para descobrir quais tabelas conhecidas uma consulta lê
+def tabelas_da_consulta(query):
+    tabelas = {tabela for tabela in ESQUEMAS if re.search(rf'\b{tabela}\b', query)}
+    for resumo, origens in DEPENDENCIAS_RESUMOS.items():
+        if resumo in tabelas:
+            tabelas.update(origens)
+    return sorted(tabelas)
+
+# Função para ler as versões atuais das tabelas lidas pela consulta
+def versoes_das_tabelas(tabelas):
+    versoes = dict(obter_conexao(somente_leitura=True).execute("SELECT Tabela, Versao FROM VersoesTabelas;").fetchall())
+    return tuple(versoes.get(tabela, 0) for tabela in tabelas)
+
+# Função para executar uma consulta usando o cache: o resultado só é reaproveitado se nenhuma tabela lida mudou de versão
+def executar_consulta_em_cache(query, parametros=()):
+    chave = (query, chave_parametros(parametros))
+    versoes = versoes_das_tabelas(tabelas_da_consulta(query))
+
+    with _trava_cache:
+        entrada = _cache_consultas.get(chave)
+        acerto = entrada is not None and entrada[0] == versoes
+        if acerto:
+            _cache_consultas.move_to_end(chave)
+            _estatisticas_cache['acertos'] += 1
+        else:
+            if entrada is not None:
+                _estatisticas_cache['invalidacoes'] += 1
+            _estatisticas_cache['falhas'] += 1
+
+    # A métrica é registrada fora da trava: os ganchos de métricas podem executar consultas
+    if acerto:
+        registrar_metrica('consulta_cache', nome_da_consulta(query), 0.0, linhas=len(entrada[1]))
+        return [dict(linha) for linha in entrada[1]]
+
+    resultados = list(iterar_consulta_sql(query, parametros))
+
+    with _trava_cache:
+        _cache_consultas[chave] = (versoes, resultados)
+        _cache_consultas.move_to_end(chave)
+        while len(_cache_consultas) > TAMANHO_MAXIMO_CACHE:
+            _cache_consultas.popitem(last=False)
+            _estatisticas_cache['descartes'] += 1
+    return [dict(linha) for linha in resultados]
+
+# Função para consultar as estatísticas do cache (acertos, falhas, descartes, invalidações e tamanho atual)
+def estatisticas_cache():
+    with _trava_cache:
+        return {**_estatisticas_cache, 'tamanho': len(_cache_consultas)}
+
+# Função para esvaziar o cache
+def limpar_cache():
+    with _trava_cache:
+        _cache_consultas.clear()
+
+# Função para executar uma consulta SQL na conexão somente leitura compartilhada
+def executar_consulta_sql(query, parametros=(), usar_cache=True):
+    if usar_cache:
+        return executar_consulta_em_cache(query, parametros)
+    return list(iterar_consulta_sql(query, parametros))
+
+# Função para obter o plano de execução (EXPLAIN QUERY PLAN) de uma consulta
+def obter_plano_consulta(query, parametros=()):
+    conn = obter_conexao(somente_leitura=True)
+    return [linha[3] for linha in conn.execute(f"EXPLAIN QUERY PLAN {query}", parametros)]
+
+# Consultor de planos: roda EXPLAIN QUERY PLAN em todas as consultas registradas e aponta as varreduras completas restantes
+def analisar_planos_consultas(consultas=None):
+    consultas = consultas or CONSULTAS_RELATORIOS
+    alertas = {}
+    for nome, query in consultas.items():
+        # O plano não depende dos valores dos parâmetros: as consultas registradas usam os padrões e as demais, nulos
+        if nome in CONSULTAS_RELATORIOS:
+            plano = obter_plano_consulta(query, parametros_consulta(nome))
+        else:
+            plano = obter_plano_consulta(query, (None,) * query.count('?'))
+        # "SCAN tabela" sem índice é uma varredura completa da tabela; "SCAN ... USING INDEX" percorre apenas o índice
+        varreduras = [etapa for etapa in plano if etapa.startswith('SCAN') and 'USING' not in etapa]
+        if varreduras:
+            alertas[nome] = varreduras
+        print(f"Plano da consulta {nome}:")
+        for etapa in plano:
+            marcador = '  [VARREDURA COMPLETA]' if etapa in varreduras else ''
+            print(f"    {etapa}{marcador}")
+    print("\n=====================================================================")
+    return alertas
+
+# Função para abrir o arquivo de saída, compactando com gzip quando pedido ou quando o nome termina em .gz
+def abrir_arquivo_saida(nome_arquivo, compactar=False):
+    if compactar or nome_arquivo.endswith('.gz'):
+        import gzip
+        return gzip.open(nome_arquivo, 'wt', encoding="utf-8")
+    return open(nome_arquivo, 'w', encoding="utf-8")
+
+# Função para gravar as linhas à medida que chegam, em JSON (lista) ou NDJSON (um objeto por linha), com memória constante
+def exportar_em_fluxo(nome_arquivo, linhas, formato='json', compactar=False):
+    total = 0
+    inicio = time.perf_counter()
+    with abrir_arquivo_saida(nome_arquivo, compactar) as f:
+        if formato == 'ndjson':
+            for linha in linhas:
+                f.write(json.dumps(linha, ensure_ascii=False))
+                f.write('\n')
+                total += 1
+        elif formato == 'json':
+            # Mesma formatação de json.dump(..., indent=4), mas escrevendo um item por vez
+            for linha in linhas:
+                f.write('[\n' if total == 0 else ',\n')
+                f.write(textwrap.indent(json.dumps(linha, indent=4, ensure_ascii=False), '    '))
+                total += 1
+            f.write('\n]' if total else '[]')
+        else:
+            raise ValueError(f"Formato de exportação desconhecido: {formato}")
+    registrar_metrica('exportacao', nome_arquivo, time.perf_counter() - inicio, linhas=total,
+                      bytes_saida=os.path.getsize(nome_arquivo), formato=formato)
+    return total
+
+# Função para exportar o resultado de uma consulta direto para o arquivo, sem materializar a lista de resultados
+def exportar_consulta_sql(nome_arquivo, query, parametros=(), formato='json', compactar=False):
+    return exportar_em_fluxo(nome_arquivo, iterar_consulta_sql(query, parametros), formato, compactar)
 
 # Função para salvar os resultados em um arquivo JSON
 def salvar_em_json(nome_arquivo, dados):
-    with open(nome_arquivo, 'w', encoding="utf-8") as f:
-        json.dump(dados, f, indent=4, ensure_ascii=False)
+    exportar_em_fluxo(nome_arquivo, dados)
+
+#Navegação paginada pelas tabelas ====================================================================================================
+
+# Número padrão de linhas por página na navegação pelas tabelas
+TAMANHO_PAGINA = 1000
+
+_chaves_tabelas = {}
+_trava_chaves = threading.Lock()
+
+# Função para descobrir as colunas da chave primária pelo PRAGMA table_info (guardadas em cache por banco e tabela).
+# Tabelas reescritas pelo to_sql perdem a PRIMARY KEY declarada: usa-se então a chave conhecida da ingestão ou o rowid
+def chave_primaria(tabela):
+    chave_cache = (CAMINHO_BANCO, tabela)
+    with _trava_chaves:
+        if chave_cache in _chaves_tabelas:
+            return _chaves_tabelas[chave_cache]
+
+    colunas = obter_conexao(somente_leitura=True).execute("SELECT name, pk FROM pragma_table_info(?);", (tabela,)).fetchall()
+    if not colunas:
+        raise ValueError(f"Tabela {tabela} não existe.")
+    chave = [nome for nome, posicao in sorted(colunas, key=lambda coluna: coluna[1]) if posicao > 0]
+    if not chave:
+        chave = [CHAVES_PRIMARIAS[tabela]] if tabela in CHAVES_PRIMARIAS else ['rowid']
 
-# Consulta 1: Listar individualmente as tabelas em ordem crescente
-def listar_tabela(tabela):
-    query = f"SELECT * FROM {tabela} ORDER BY {tabela[:-1]}ID;"  #Removendo 's' para obter o nome da chave primária
-    resultados = executar_consulta_sql(query)
+    with _trava_chaves:
+        _chaves_tabelas[chave_cache] = chave
+    return chave
+
+# Função para citar um nome de tabela ou coluna, que não pode ser passado como parâmetro vinculado
+def citar_identificador(nome):
+    return '"' + nome.replace('"', '""') + '"'
+
+# Funções para gerar e ler o token que permite retomar a navegação: a tabela e a chave da última linha entregue
+def codificar_token(tabela, chave):
+    return base64.urlsafe_b64encode(json.dumps([tabela, chave]).encode('utf-8')).decode('ascii')
+
+def decodificar_token(tabela, token, colunas_chave):
+    try:
+        tabela_token, chave = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError("Token de paginação inválido.")
+    if tabela_token != tabela:
+        raise ValueError(f"O token de paginação é da tabela {tabela_token}, não da tabela {tabela}.")
+    # A chave precisa ter um valor simples para cada coluna da chave primária da tabela
+    if (not isinstance(chave, list) or len(chave) != len(colunas_chave)
+            or not all(valor is None or isinstance(valor, (str, int, float)) for valor in chave)):
+        raise ValueError("Token de paginação inválido.")
+    return chave
+
+# Função para ler uma página da tabela em ordem de chave primária, por paginação por chave (keyset): a página continua a
+# partir da última chave entregue, com custo igual em qualquer profundidade. Retorna as linhas e o token da próxima página
+# (None na última)
+def paginar_tabela(tabela, tamanho_pagina=TAMANHO_PAGINA, token=None):
+    if tamanho_pagina <= 0:
+        raise ValueError(f"O tamanho da página deve ser positivo (recebido: {tamanho_pagina}).")
+    chave = chave_primaria(tabela)
+    colunas_chave = ', '.join(citar_identificador(coluna) for coluna in chave)
+    origem = citar_identificador(tabela)
+    selecao = f"SELECT {colunas_chave}, * FROM {origem}" if chave == ['rowid'] else f"SELECT * FROM {origem}"
+
+    if token is None:
+        query = f"{selecao} ORDER BY {colunas_chave} LIMIT ?;"
+        parametros = (tamanho_pagina,)
+    else:
+        ultima_chave = decodificar_token(tabela, token, chave)
+        marcadores = ', '.join('?' for _ in chave)
+        query = f"{selecao} WHERE ({colunas_chave}) > ({marcadores}) ORDER BY {colunas_chave} LIMIT ?;"
+        parametros = (*ultima_chave, tamanho_pagina)
+
+    # As páginas não passam pelo cache: percorrer uma tabela grande descartaria dele os resultados dos relatórios
+    linhas = executar_consulta_sql(query, parametros, usar_cache=False)
+    if len(linhas) < tamanho_pagina:
+        return linhas, None
+    return linhas, codificar_token(tabela, [linhas[-1][coluna] for coluna in chave])
+
+# Função para percorrer a tabela inteira página por página, sem materializá-la
+def iterar_tabela(tabela, tamanho_pagina=TAMANHO_PAGINA, token=None):
+    while True:
+        linhas, token = paginar_tabela(tabela, tamanho_pagina, token)
+        yield from linhas
+        if token is None:
+            return
+
+# Consulta 1: Listar individualmente as tabelas em ordem crescente de chave primária, página por página.
+# Com `paginas`, para depois desse número de páginas e mostra o token para continuar de onde parou
+def listar_tabela(tabela, tamanho_pagina=TAMANHO_PAGINA, token=None, paginas=None):
     print(f"Conteúdo da tabela '{tabela}':")
-    for linha in resultados:
-        print(linha)
+    try:
+        paginas_lidas = 0
+        while paginas is None or paginas_lidas < paginas:
+            linhas, token = paginar_tabela(tabela, tamanho_pagina, token)
+            paginas_lidas += 1
+            for linha in linhas:
+                print(linha)
+            if token is None:
+                break
+        if token is not None:
+            print(f"\nPara continuar a listagem, use o token: {token}")
+    except (ValueError, sqlite3.Error) as e:
+        print(f"\nErro ao listar a tabela {tabela}: {e}")
     print("\n=====================================================================")
 
 # Consulta 2: Listar os funcionários com cargos, departamentos e os respectivos dependentes
 def listar_funcionarios_com_info():
-    query = """
-        SELECT f.Nome AS Funcionario, c.Descricao AS Cargo, d.NomeDepartamento, dep.Nome AS Dependente
-        FROM Funcionarios f
-        JOIN Cargos c ON f.CargoID = c.CargoID
-        JOIN Departamentos d ON f.DepartamentoID = d.DepartamentoID
-        LEFT JOIN Dependentes dep ON f.FuncionarioID = dep.FuncionarioID;
-        """
-    resultados = executar_consulta_sql(query)
+    resultados = executar_consulta('listar_funcionarios_com_info')
     print("Funcionários com informações completas (Nome, Cargo, Departamento, Dependente):")
     for linha in resultados:
         print(linha)
     print("\n=====================================================================")
     
 
-# Consulta 3: Listar os funcionários que tiveram aumento salarial nos últimos 3 meses
-def listar_funcionarios_com_aumento():
-    query = """
-      SELECT f.Nome
-      FROM Funcionarios f
-      JOIN HistoricoSalarios hs ON f.FuncionarioID = hs.FuncionarioID
-      WHERE hs.Data BETWEEN '2023-01' AND '2023-06'
-      GROUP BY f.Nome
-      HAVING MIN(hs.Salario) != MAX(hs.Salario);
-      """
-    resultados = executar_consulta_sql(query)
-    print("Funcionários com aumento salarial nos últimos 3 meses:")
+# Data mais recente do histórico de salários, usada como referência padrão das janelas
+def data_referencia_salarios():
+    return executar_consulta('data_referencia_salarios')[0]['Data']
+
+# Alterações de salário (valor anterior, novo e variação) na janela de `meses` meses terminada em data_referencia,
+# calculadas em uma passada ordenada por (FuncionarioID, Data) com LAG
+def calcular_alteracoes_salariais(meses=JANELA_AUMENTOS_MESES, data_referencia=None, somente_aumentos=False):
+    data_referencia = data_referencia or data_referencia_salarios()
+    if data_referencia is None:
+        return []
+    alteracoes = executar_consulta('listar_alteracoes_salariais', referencia=data_referencia, janela=f'-{meses} months')
+    if somente_aumentos:
+        alteracoes = [alteracao for alteracao in alteracoes if alteracao['Variacao'] > 0]
+    return alteracoes
+
+# Consulta 3: Listar os funcionários que tiveram aumento salarial nos últimos meses (3 por padrão), com a data e o valor do último aumento
+def listar_funcionarios_com_aumento(meses=JANELA_AUMENTOS_MESES, data_referencia=None):
+    ultima_data = data_referencia_salarios()
+    data_referencia = data_referencia or ultima_data
+    if ultima_data is None or data_referencia >= ultima_data:
+        # Até a data mais recente, o último aumento de cada funcionário (SalariosAtuais) basta: o histórico não é relido
+        resultados = executar_consulta('listar_funcionarios_com_aumento', referencia=data_referencia, janela=f'-{meses} months')
+    else:
+        # Em uma data passada, o último aumento de cada funcionário dentro da janela sai do histórico
+        ultimos_aumentos = {}
+        for alteracao in calcular_alteracoes_salariais(meses, data_referencia, somente_aumentos=True):
+            ultimos_aumentos[alteracao['FuncionarioID']] = {
+                'Nome': alteracao['Nome'], 'DataAumento': alteracao['Data'], 'Aumento': alteracao['Variacao'],
+            }
+        resultados = sorted(ultimos_aumentos.values(), key=lambda linha: linha['Nome'])
+    print(f"Funcionários com aumento salarial nos últimos {meses} meses:")
     for linha in resultados:
         print(linha)
     print("\n=====================================================================")
 
 # Consulta 4: Listar a média de idade dos filhos dos funcionários por departamento
 def listar_media_idade_filhos_por_departamento():
-    query = """
-       SELECT d.NomeDepartamento, ROUND(AVG(dep.Idade)) AS MediaIdade
-       FROM Departamentos d
-       JOIN Funcionarios f ON d.DepartamentoID = f.DepartamentoID
-       JOIN Dependentes dep ON f.FuncionarioID = dep.FuncionarioID
-       GROUP BY d.NomeDepartamento;
-       """
-    resultados = executar_consulta_sql(query) 
+    resultados = executar_consulta('listar_media_idade_filhos_por_departamento') 
     print("Média de idade dos filhos por departamento:")
     for linha in resultados:
         print(linha)
     print("\n=====================================================================")
 
 # Consulta 5: Listar qual estagiário possui filho
-def listar_estagiarios_com_filho():
-    query = """
-        SELECT DISTINCT f.Nome
-        FROM Funcionarios f
-        JOIN Cargos c ON f.CargoID = c.CargoID
-        JOIN Dependentes dep ON f.FuncionarioID = dep.FuncionarioID
-        WHERE c.Descricao = 'Estagiário';
-        """
-    resultados = executar_consulta_sql(query)
+def listar_estagiarios_com_filho(**parametros):
+    resultados = executar_consulta('listar_estagiarios_com_filho', **parametros)
     print("Estagiários que possuem filho:")
     for linha in resultados:
         print(linha)
@@ -266,15 +1429,7 @@ def listar_estagiarios_com_filho():
     
 #Consulta 1 TP 4: Listar a média dos salários dos funcionários responsáveis por projetos concluídos, agrupados por departamento
 def listar_media_salarios_funcionarios_projetos_concluidos():
-    query = """
-        SELECT d.NomeDepartamento AS Departamento, AVG(f.Salario) AS MediaSalarios
-        FROM Funcionarios f
-        JOIN Projetos p ON f.FuncionarioID = p.FuncionarioResponsavelID
-        JOIN Departamentos d ON f.DepartamentoID = d.DepartamentoID
-        WHERE p.Status = 'Concluído'
-        GROUP BY d.NomeDepartamento;
-        """
-    resultados = executar_consulta_sql(query)
+    resultados = executar_consulta('listar_media_salarios_funcionarios_projetos_concluidos')
     print("Média dos salários dos funcionários responsáveis por projetos concluídos, agrupados por departamento:")
     for linha in resultados:
         print(linha)
@@ -282,33 +1437,59 @@ def listar_media_salarios_funcionarios_projetos_concluidos():
     return resultados
     
 #Consulta 2 TP4: Identificar os três recursos materiais mais usados nos projetos, listando a descrição do recurso e a quantidade total usada
-def listar_recursos_mais_utilizados():
-    query = """
-        SELECT DescricaoRecurso, SUM(QuantidadeRecurso) AS TotalUtilizado
-        FROM RecursosProjetos
-        WHERE TipoRecurso = 'Material'
-        GROUP BY DescricaoRecurso
-        ORDER BY TotalUtilizado DESC
-        LIMIT 3;
-        """
-    resultados = executar_consulta_sql(query)
+def listar_recursos_mais_utilizados(**parametros):
+    resultados = executar_consulta('listar_recursos_mais_utilizados', **parametros)
     print("Recursos materiais mais utilizados nos projetos:")
     for linha in resultados:
         print(linha)
     print("\n=====================================================================")
     return resultados
     
+#Top-K de recursos ===================================================================================================================
+
+# Dimensões do resumo de recursos pelas quais o top-K pode agrupar
+DIMENSOES_RECURSOS = ('TipoRecurso', 'DescricaoRecurso', 'ProjetoID', 'Mes')
+
+# Filtros aceitos pelo top-K de recursos (Mes no formato AAAA-MM)
+FILTROS_RECURSOS = {
+    'tipo_recurso': 'TipoRecurso = ?',
+    'descricao_recurso': 'DescricaoRecurso = ?',
+    'projeto_id': 'ProjetoID = ?',
+    'mes': 'Mes = ?',
+    'mes_inicio': 'Mes >= ?',
+    'mes_fim': 'Mes <= ?',
+}
+
+# Top-K de uso de recursos em qualquer fatia (tipo, descrição, projeto, mês ou intervalo de meses), agrupado por uma das
+# dimensões. Lê só o resumo ResumoRecursos, em fluxo, e guarda no máximo k grupos em um heap. Empates saem em ordem crescente
+def top_recursos(k=3, agrupar_por='DescricaoRecurso', **filtros):
+    if agrupar_por not in DIMENSOES_RECURSOS:
+        raise ValueError(f"Dimensão inválida: {agrupar_por} (use {', '.join(DIMENSOES_RECURSOS)})")
+    desconhecidos = set(filtros) - set(FILTROS_RECURSOS)
+    if desconhecidos:
+        raise ValueError(f"Filtros desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    condicoes = [FILTROS_RECURSOS[filtro] for filtro in filtros]
+    query = (f"SELECT {agrupar_por}, {TOTAL_RESUMO_RECURSOS} AS TotalUtilizado FROM ResumoRecursos"
+             f"{' WHERE ' + ' AND '.join(condicoes) if condicoes else ''} GROUP BY {agrupar_por};")
+    linhas = iterar_consulta_sql(query, tuple(filtros.values()))
+    # Totais nulos (nenhuma quantidade informada) ficam por último, como no ORDER BY ... DESC do SQLite
+    return heapq.nsmallest(k, linhas, key=lambda linha: (linha['TotalUtilizado'] is None, -(linha['TotalUtilizado'] or 0),
+                                                         linha[agrupar_por] is None, linha[agrupar_por]))
+
+# Relatório do top-K de recursos em uma fatia
+def listar_top_recursos(k=3, agrupar_por='DescricaoRecurso', **filtros):
+    resultados = top_recursos(k, agrupar_por, **filtros)
+    descricao_filtros = ', '.join(f"{filtro}={valor}" for filtro, valor in filtros.items()) or 'todos os recursos'
+    print(f"Top {k} por {agrupar_por} ({descricao_filtros}):")
+    for linha in resultados:
+        print(linha)
+    print("\n=====================================================================")
+    return resultados
+
 #Consulta 3 TP4: Calcular o custo total dos projetos por departamento, considerando apenas os projetos 'Concluídos'
 def listar_custo_total_projetos_concluidos_por_departamento():
-    query = """
-        SELECT d.NomeDepartamento AS Departamento, SUM(p.Custo) AS CustoTotal
-        FROM Projetos p
-        JOIN Funcionarios f ON p.FuncionarioResponsavelID = f.FuncionarioID
-        JOIN Departamentos d ON f.DepartamentoID = d.DepartamentoID
-        WHERE p.Status = 'Concluído'
-        GROUP BY d.NomeDepartamento;
-        """
-    resultados = executar_consulta_sql(query)
+    resultados = executar_consulta('listar_custo_total_projetos_concluidos_por_departamento')
     print("Custo total dos projetos concluídos por departamento:")
     for linha in resultados:
         print(linha)
@@ -316,110 +1497,241 @@ def listar_custo_total_projetos_concluidos_por_departamento():
     return resultados
     
 #Consulta 4 TP4: Listar todos os projetos com seus respectivos nomes, custo, data de início, data de conclusão e o nome do funcionário responsável, que estejam 'Em Execução'
-def listar_projetos_em_execucao():
-    query = """
-        SELECT p.NomeProjeto, p.Custo, p.DataInicio, p.DataConclusao, f.Nome AS FuncionarioResponsavel
-        FROM Projetos p
-        JOIN Funcionarios f ON p.FuncionarioResponsavelID = f.FuncionarioID
-        WHERE p.Status = 'Em Execução';
-        """
-    resultados = executar_consulta_sql(query)
+def listar_projetos_em_execucao(**parametros):
+    resultados = executar_consulta('listar_projetos_em_execucao', **parametros)
     print("Projetos em execução: Nome do Projeto, Custo, Data de Início, Data de Conclusão e Funcionário Responsável:" )
     for linha in resultados:
         print(linha)
     print("\n=====================================================================")
 
 #Consulta 5 TP4: Identificar o projeto com o maior número de dependentes envolvidos, considerando que os dependentes são associados aos funcionários que estão gerenciando os projetos
-def listar_projeto_maior_numero_dependentes():
-    query = """
-        SELECT p.NomeProjeto, COUNT(dep.DependenteID) AS NumeroDependentes
-        FROM Projetos p
-        JOIN Funcionarios f ON p.FuncionarioResponsavelID = f.FuncionarioID
-        JOIN Dependentes dep ON f.FuncionarioID = dep.FuncionarioID
-        GROUP BY p.NomeProjeto
-        ORDER BY NumeroDependentes DESC
-        LIMIT 1;
-        """
-    resultados = executar_consulta_sql(query)
+def listar_projeto_maior_numero_dependentes(**parametros):
+    resultados = executar_consulta('listar_projeto_maior_numero_dependentes', **parametros)
     print("Projeto com o maior número de dependentes envolvidos:")
     for linha in resultados:
         print(linha)
     print("\n=====================================================================")
 
 
-# Estabelecer conexão com o banco de dados
-conn = sqlite3.connect('empresa.db')
+#Queries com manipulação de arquivo CSV =================================================================================================
 
-# Executar as consultas
-listar_tabela('Funcionarios') #Query 1
-listar_tabela('Cargos')
-listar_tabela('Departamentos')
-listar_tabela('HistoricoSalarios')
-listar_tabela('Dependentes')
+#Snapshots colunares ==================================================================================================================
 
-listar_funcionarios_com_info() #Query 2
-listar_funcionarios_com_aumento() #Query 3
-listar_media_idade_filhos_por_departamento() #Query 4
-listar_estagiarios_com_filho() #Query 5
-listar_media_salarios_funcionarios_projetos_concluidos() #Query 1 TP 4
-listar_recursos_mais_utilizados() #Query 2 TP 4
-listar_custo_total_projetos_concluidos_por_departamento() #Query 3 TP 4
-listar_projetos_em_execucao() #Query 4 TP 4
-listar_projeto_maior_numero_dependentes() #Query 5 TP 4
+# Diretório com uma cópia colunar (um arquivo .npy por coluna) de cada tabela, reaproveitada enquanto a tabela não muda
+DIRETORIO_SNAPSHOTS = 'snapshots'
 
-# Fechar conexão com o banco de dados
-conn.close()
+# Arquivo CSV de origem de cada tabela, cujo hash identifica o conteúdo carregado
+ARQUIVOS_TABELAS = dict(ORDEM_CARGA)
 
-# Executar as consultas e salvar os resultados em arquivos JSON (Queries 1, 2, 3 TP4)
-media_salarios = listar_media_salarios_funcionarios_projetos_concluidos()
-salvar_em_json('media_salarios_projetos_concluidos.json', media_salarios)
+# Função para obter a "versão" atual de uma tabela: contador de alterações e hash do CSV carregado
+def versao_atual_tabela(nome_tabela):
+    conn = obter_conexao(somente_leitura=True)
+    versao = conn.execute("SELECT Versao FROM VersoesTabelas WHERE Tabela = ?;", (nome_tabela,)).fetchone()
+    impressao = conn.execute("SELECT Hash FROM ControleIngestao WHERE Arquivo = ?;",
+                             (ARQUIVOS_TABELAS.get(nome_tabela),)).fetchone()
+    return [versao[0] if versao else 0, impressao[0] if impressao else None]
 
-recursos_mais_utilizados = listar_recursos_mais_utilizados()
-salvar_em_json('recursos_mais_utilizados.json', recursos_mais_utilizados)
+# Função para exportar a tabela do banco para o diretório de snapshot, uma coluna por arquivo
+def gerar_snapshot(nome_tabela, versao):
+    import numpy as np
+    import pandas as pd
 
-custo_total_projetos = listar_custo_total_projetos_concluidos_por_departamento()
-salvar_em_json('custo_total_projetos_concluidos.json', custo_total_projetos)
+    diretorio = os.path.join(DIRETORIO_SNAPSHOTS, nome_tabela)
+    os.makedirs(diretorio, exist_ok=True)
 
-#Queries com manipulação de arquivo CSV =================================================================================================
+    # Os metadados são removidos antes e gravados por último: um snapshot interrompido no meio fica inválido
+    caminho_metadados = os.path.join(diretorio, 'metadados.json')
+    if os.path.exists(caminho_metadados):
+        os.remove(caminho_metadados)
 
-#Preparando os Dataframes
-df_historico_salarios = pd.read_csv('historico_salarios.csv', sep=';', decimal=',')
-df_cargos = pd.read_csv('cargos.csv', sep=';', decimal=',')
-df_departamentos = pd.read_csv('departamento.csv', sep=';', decimal=',')
-df_funcionarios = pd.read_csv('funcionarios.csv', sep=';', decimal=',')
-df_dependentes = pd.read_csv('dependentes.csv', sep=';', decimal=',')
+    chave = CHAVES_PRIMARIAS[nome_tabela]
+    df = pd.read_sql_query(f"SELECT * FROM {nome_tabela} ORDER BY {chave}", obter_conexao(somente_leitura=True))
+
+    colunas = {}
+    for coluna in df.columns:
+        serie = df[coluna]
+        if serie.dtype.kind in 'iufb':
+            np.save(os.path.join(diretorio, f'{coluna}.npy'), serie.to_numpy())
+            colunas[coluna] = {'nulos': False}
+        else:
+            # Texto é gravado com largura fixa (mapeável em memória); os nulos ficam em uma máscara à parte
+            nulos = serie.isna().to_numpy()
+            np.save(os.path.join(diretorio, f'{coluna}.npy'), serie.fillna('').astype(str).to_numpy(dtype=str))
+            if nulos.any():
+                np.save(os.path.join(diretorio, f'{coluna}.nulos.npy'), nulos)
+            colunas[coluna] = {'nulos': bool(nulos.any())}
+
+    with open(caminho_metadados, 'w', encoding="utf-8") as f:
+        json.dump({'versao': versao, 'colunas': colunas}, f, ensure_ascii=False)
+    return colunas
+
+# Função para ler um snapshot (somente as colunas pedidas), regenerando-o apenas se a tabela mudou desde a última exportação.
+# Com tipar=True, as colunas recebem os tipos compactos declarados em TIPOS_DATAFRAMES
+def carregar_snapshot(nome_tabela, colunas=None, tipar=True):
+    import numpy as np
+    import pandas as pd
+
+    diretorio = os.path.join(DIRETORIO_SNAPSHOTS, nome_tabela)
+    caminho_metadados = os.path.join(diretorio, 'metadados.json')
+    versao = versao_atual_tabela(nome_tabela)
+
+    metadados = None
+    if os.path.exists(caminho_metadados):
+        with open(caminho_metadados, encoding="utf-8") as f:
+            metadados = json.load(f)
+    if metadados is None or metadados['versao'] != versao:
+        metadados = {'versao': versao, 'colunas': gerar_snapshot(nome_tabela, versao)}
+
+    dados = {}
+    for coluna in colunas or list(metadados['colunas']):
+        valores = np.load(os.path.join(diretorio, f'{coluna}.npy'), mmap_mode='r')
+        if metadados['colunas'][coluna]['nulos']:
+            nulos = np.load(os.path.join(diretorio, f'{coluna}.nulos.npy'))
+            valores = pd.Series(valores).mask(nulos)
+        dados[coluna] = valores
+    df = pd.DataFrame(dados)
+    return aplicar_tipos(nome_tabela, df) if tipar else df
+
+#Tipos dos DataFrames ================================================================================================================
+
+# Esquema de tipos de cada tabela nos DataFrames: 'id' reduz o inteiro ao menor tipo que comporta os valores (inteiro anulável
+# quando há nulos), 'categoria' guarda texto de baixa cardinalidade como códigos inteiros (filtros e groupbys comparam os códigos)
+# e 'data' converte para datetime. Colunas fora do esquema mantêm o tipo do snapshot
+TIPOS_DATAFRAMES = {
+    'Funcionarios': {'FuncionarioID': 'id', 'CargoID': 'id', 'DepartamentoID': 'id', 'Genero': 'categoria'},
+    'Cargos': {'CargoID': 'id', 'Descricao': 'categoria', 'Nivel': 'categoria', 'Beneficios': 'categoria'},
+    'Departamentos': {'DepartamentoID': 'id', 'GerenteID': 'id', 'NomeDepartamento': 'categoria'},
+    'HistoricoSalarios': {'HistoricoSalarioID': 'id', 'FuncionarioID': 'id', 'Data': 'data'},
+    'Dependentes': {'DependenteID': 'id', 'FuncionarioID': 'id', 'Genero': 'categoria'},
+    'Projetos': {'ProjetoID': 'id', 'FuncionarioResponsavelID': 'id', 'Status': 'categoria',
+                 'DataInicio': 'data', 'DataConclusao': 'data'},
+    'RecursosProjetos': {'RecursosProjetoID': 'id', 'ProjetoID': 'id', 'TipoRecurso': 'categoria',
+                         'DescricaoRecurso': 'categoria', 'DataUtilizacao': 'data'},
+}
+
+# Função para reduzir uma coluna de IDs ao menor inteiro que comporta os valores
+def reduzir_inteiro(serie):
+    import pandas as pd
+
+    # Valores que não são inteiros (texto como 'null' gravado por uma carga antiga, frações) viram NA em vez de abortar
+    serie = pd.to_numeric(serie, errors='coerce')
+    serie = serie.where(serie.isna() | (serie % 1 == 0))
+    if not serie.isna().any():
+        return pd.to_numeric(serie, downcast='integer')
+    maximo = serie.abs().max()
+    for bits in (8, 16, 32):
+        if pd.isna(maximo) or maximo < 2 ** (bits - 1):
+            return serie.astype(f'Int{bits}')
+    return serie.astype('Int64')
+
+# Função para aplicar o esquema de tipos da tabela às colunas presentes no DataFrame
+def aplicar_tipos(nome_tabela, df):
+    import pandas as pd
+
+    for coluna, tipo in TIPOS_DATAFRAMES.get(nome_tabela, {}).items():
+        if coluna not in df.columns:
+            continue
+        if tipo == 'id':
+            convertida = reduzir_inteiro(df[coluna])
+            invalidos = int((df[coluna].notna() & convertida.isna()).sum())
+            if invalidos:
+                print(f"\nAviso: {invalidos} valor(es) não inteiro(s) em {nome_tabela}.{coluna} tratados como ausentes.")
+            df[coluna] = convertida
+        elif tipo == 'categoria':
+            df[coluna] = df[coluna].astype('category')
+        elif tipo == 'data':
+            df[coluna] = pd.to_datetime(df[coluna], format='ISO8601', errors='coerce')
+    return df
+
+#Preparando os Dataframes (lidos dos snapshots do banco, somente com as colunas usadas pelas consultas)
+df_historico_salarios = df_cargos = df_departamentos = df_funcionarios = df_dependentes = df_fato_funcionarios = None
+
+# Tabela e colunas de origem de cada DataFrame (None lê todas as colunas)
+COLUNAS_DATAFRAMES = {
+    'df_historico_salarios': ('HistoricoSalarios', ['FuncionarioID', 'Salario']),
+    'df_cargos': ('Cargos', None),
+    'df_departamentos': ('Departamentos', None),
+    'df_funcionarios': ('Funcionarios', ['FuncionarioID', 'Nome', 'CargoID', 'DepartamentoID', 'Salario', 'Genero']),
+    'df_dependentes': ('Dependentes', ['DependenteID', 'FuncionarioID', 'Genero']),
+}
+
+def carregar_dataframes():
+    global df_historico_salarios, df_cargos, df_departamentos, df_funcionarios, df_dependentes, df_fato_funcionarios
+    df_historico_salarios = carregar_snapshot(*COLUNAS_DATAFRAMES['df_historico_salarios'])
+    df_cargos = carregar_snapshot(*COLUNAS_DATAFRAMES['df_cargos'])
+    df_departamentos = carregar_snapshot(*COLUNAS_DATAFRAMES['df_departamentos'])
+    df_funcionarios = carregar_snapshot(*COLUNAS_DATAFRAMES['df_funcionarios'])
+    df_dependentes = carregar_snapshot(*COLUNAS_DATAFRAMES['df_dependentes'])
+    df_fato_funcionarios = montar_fato_funcionarios()
+
+# Função para montar a tabela fato de funcionários: indexada por FuncionarioID e já unida a cargos, departamentos,
+# contagem de dependentes por gênero e salário médio do histórico. Os joins são feitos uma única vez por execução.
+def montar_fato_funcionarios():
+    fato = df_funcionarios.set_index('FuncionarioID')
+
+    cargos = df_cargos.set_index('CargoID')[['Descricao', 'Nivel']].rename(columns={'Descricao': 'Cargo'})
+    fato = fato.join(cargos, on='CargoID')
+    fato = fato.join(df_departamentos.set_index('DepartamentoID')['NomeDepartamento'], on='DepartamentoID')
+
+    # Contagem de dependentes por gênero (Filhas = dependentes do gênero feminino, Filhos = masculino)
+    dependentes_por_genero = (
+        df_dependentes.groupby(['FuncionarioID', 'Genero']).size().unstack(fill_value=0)
+        .reindex(index=fato.index, columns=['Feminino', 'Masculino'], fill_value=0)
+    )
+    fato['Filhas'] = reduzir_inteiro(dependentes_por_genero['Feminino'].fillna(0).astype(int))
+    fato['Filhos'] = reduzir_inteiro(dependentes_por_genero['Masculino'].fillna(0).astype(int))
+    fato['TotalDependentes'] = reduzir_inteiro(df_dependentes.groupby('FuncionarioID').size().reindex(fato.index, fill_value=0))
+
+    fato['SalarioMedio'] = df_historico_salarios.groupby('FuncionarioID')['Salario'].mean().reindex(fato.index)
+    return fato
+
+# Função para carregar os DataFrames apenas na primeira vez em que um relatório pandas precisar deles
+def garantir_dataframes():
+    if df_fato_funcionarios is None:
+        carregar_dataframes()
+
+# Relatório de memória dos DataFrames: bytes ocupados com os tipos compactos e com os tipos padrão do snapshot
+def relatorio_memoria_dataframes():
+    garantir_dataframes()
+    relatorio = {}
+    for nome, (nome_tabela, colunas) in COLUNAS_DATAFRAMES.items():
+        relatorio[nome] = {
+            'bytes': int(globals()[nome].memory_usage(deep=True).sum()),
+            'bytes_sem_tipos': int(carregar_snapshot(nome_tabela, colunas, tipar=False).memory_usage(deep=True).sum()),
+        }
+    relatorio['df_fato_funcionarios'] = {'bytes': int(df_fato_funcionarios.memory_usage(deep=True).sum()), 'bytes_sem_tipos': None}
+
+    print("Memória dos DataFrames:")
+    for nome, medida in relatorio.items():
+        comparacao = ''
+        if medida['bytes_sem_tipos']:
+            reducao = 100 * (1 - medida['bytes'] / medida['bytes_sem_tipos'])
+            comparacao = f" (sem tipos: {medida['bytes_sem_tipos'] / 1024:.1f} KiB, {reducao:.0f}% menor)"
+        print(f"{nome}: {medida['bytes'] / 1024:.1f} KiB{comparacao}")
+    print("\n=====================================================================")
+    return relatorio
 
 #Consulta 6 - Listar o funcionário com o salário médio mais alto
 def listar_funcionario_com_maior_salario_medio():
-    media_salarios = df_historico_salarios.groupby('FuncionarioID')['Salario'].mean()
-    funcionario_com_maior_salario_medio = media_salarios.idxmax() - 1 #Acertando o índice para corresponder ao FuncionarioID
-    nome_funcionario = df_funcionarios.loc[funcionario_com_maior_salario_medio, 'Nome']
-    print(f'O funcionário com o maior salário médio é {nome_funcionario}, com um salário médio de R${media_salarios.max():.2f}.')
+    garantir_dataframes()
+    # Busca pela chave (FuncionarioID) na tabela fato, em vez da posição da linha
+    funcionario_com_maior_salario_medio = df_fato_funcionarios['SalarioMedio'].idxmax()
+    nome_funcionario = df_fato_funcionarios.at[funcionario_com_maior_salario_medio, 'Nome']
+    salario_medio = df_fato_funcionarios.at[funcionario_com_maior_salario_medio, 'SalarioMedio']
+    print(f'O funcionário com o maior salário médio é {nome_funcionario}, com um salário médio de R${salario_medio:.2f}.')
     print("\n=====================================================================")
 
 
 #Consulta 7 - Listar o analista que é pai de duas meninas
 def listar_analistas_com_duas_filhas():
+    garantir_dataframes()
     
-    # Filtra funcionários que são analistas homens
-    analistas_homens = df_funcionarios[
-        (df_funcionarios["CargoID"] == 3) & (df_funcionarios["Genero"] == "Masculino")
+    # Filtra, na tabela fato, analistas homens com exatamente duas filhas (a contagem por gênero já está pré-calculada)
+    resultado = df_fato_funcionarios[
+        (df_fato_funcionarios["CargoID"] == 3)
+        & (df_fato_funcionarios["Genero"] == "Masculino")
+        & (df_fato_funcionarios["Filhas"] == 2)
     ]
-
-    # Filtra dependentes que são filhas do gênero feminino
-    filhas = df_dependentes[(df_dependentes["Genero"] == "Feminino")]
-
-    # Junta os DataFrames de analistas homens e filhas com base no FuncionarioID
-    analistas_com_filhas = analistas_homens.merge(filhas, on="FuncionarioID")
-
-    # Agrupa por FuncionarioID e conta o número de filhas
-    contagem_filhas = analistas_com_filhas.groupby("FuncionarioID")["DependenteID"].count()
-
-    # Filtra analistas com exatamente duas filhas
-    analistas_com_duas_filhas = contagem_filhas[contagem_filhas == 2].index.tolist()
-
-    # Filtra o DataFrame original de funcionários para incluir apenas os analistas com duas filhas
-    resultado = df_funcionarios[df_funcionarios["FuncionarioID"].isin(analistas_com_duas_filhas)]
     
     print(f"Analistas que são pais de duas filhas: {resultado['Nome'].tolist()}")
     print("\n=====================================================================")
@@ -427,10 +1739,11 @@ def listar_analistas_com_duas_filhas():
    
 #Consulta 8 - Listar o analista com o salário mais alto e que ganhe entre R$ 5000 e R$ 9000    
 def listar_analista_salario_mais_alto():
+    garantir_dataframes()
 
     # Filtra funcionários que são analistas e estão na faixa salarial desejada
-    analistas_faixa_salarial = df_funcionarios[
-        (df_funcionarios["CargoID"] == 3) & (df_funcionarios["Salario"] >= 5000) & (df_funcionarios["Salario"] <= 9000)
+    analistas_faixa_salarial = df_fato_funcionarios[
+        (df_fato_funcionarios["CargoID"] == 3) & (df_fato_funcionarios["Salario"].between(5000, 9000))
     ]
 
     # Encontra o analista com o salário mais alto
@@ -443,19 +1756,11 @@ def listar_analista_salario_mais_alto():
     print("\n=====================================================================")
     
 #Consulta 9 - Listar qual departamento possui o maior número de dependentes
-def listar_departamento_mais_dependentes():
-    # Junta os DataFrames de funcionários e dependentes com base no FuncionarioID
-    funcionarios_com_dependentes = df_funcionarios.merge(df_dependentes, on="FuncionarioID", how="left")
-
-    # Junta o DataFrame resultante com o DataFrame de departamentos com base no DepartamentoID
-    funcionarios_dependentes_departamentos = funcionarios_com_dependentes.merge(df_departamentos, on="DepartamentoID", how="left")
-
-    # Agrupa por departamento e conta o número de dependentes
-    contagem_dependentes = funcionarios_dependentes_departamentos.groupby("NomeDepartamento")["DependenteID"].count()
-
-    # Encontra o departamento com o maior número de dependentes
-    departamento_mais_dependentes = contagem_dependentes.idxmax()
-    numero_dependentes = contagem_dependentes.max()
+def listar_departamento_mais_dependentes(**parametros):
+    # Lê a contagem de dependentes já agregada por departamento na tabela de resumo
+    resultado = executar_consulta('listar_departamento_mais_dependentes', **parametros)[0]
+    departamento_mais_dependentes = resultado['NomeDepartamento']
+    numero_dependentes = resultado['TotalDependentes']
 
     # Retorna o nome do departamento e o número de dependentes
     print(f"O departamento com o maior número de dependentes é o {departamento_mais_dependentes}, com {numero_dependentes} dependentes.")
@@ -463,25 +1768,1067 @@ def listar_departamento_mais_dependentes():
 
 #Consulta 10 - Listar a média de salário por departamento, em ordem decrescente
 def listar_media_salarial_por_departamento():
+    import pandas as pd
     
-    # Junta os DataFrames de funcionários e departamentos com base no DepartamentoID
-    funcionarios_departamentos = df_funcionarios.merge(df_departamentos, on="DepartamentoID")
+    # Lê a média salarial por departamento, já ordenada de forma decrescente, a partir da tabela de resumo
+    media_salarial = executar_consulta('listar_media_salarial_por_departamento')
 
-    # Calcula a média salarial por departamento e ordena em ordem decrescente
-    media_salarial = funcionarios_departamentos.groupby("NomeDepartamento")["Salario"].mean().sort_values(ascending=False)
-    
     #Oraganizando o resultado em um DataFrame e nomeando corretamente as colunas
-    df_resultado = pd.DataFrame({'Departamento': media_salarial.index, 'Média Salarial': media_salarial.values})
+    df_resultado = pd.DataFrame(media_salarial).rename(columns={'MediaSalarial': 'Média Salarial'})
 
     print("Média salarial por departamento (em ordem decrescente):")
     print(df_resultado)
     print("\n=====================================================================")
 
-listar_funcionario_com_maior_salario_medio() #Query 6
-listar_analistas_com_duas_filhas() #Query 7
-listar_analista_salario_mais_alto() #Query 8
-listar_departamento_mais_dependentes() #Query 9
-listar_media_salarial_por_departamento() #Query 10
+#Execução dos relatórios ==============================================================================================================
+
+# Relatórios disponíveis: nome -> (função, tipo). Os de tipo 'sql' rodam no processo principal, imprimindo direto na saída,
+# e os de tipo 'pandas' rodam em processos separados, pois são limitados por CPU.
+RELATORIOS = {
+    'listar_tabela_Funcionarios': (partial(listar_tabela, 'Funcionarios'), 'sql'), #Query 1
+    'listar_tabela_Cargos': (partial(listar_tabela, 'Cargos'), 'sql'),
+    'listar_tabela_Departamentos': (partial(listar_tabela, 'Departamentos'), 'sql'),
+    'listar_tabela_HistoricoSalarios': (partial(listar_tabela, 'HistoricoSalarios'), 'sql'),
+    'listar_tabela_Dependentes': (partial(listar_tabela, 'Dependentes'), 'sql'),
+    'listar_funcionarios_com_info': (listar_funcionarios_com_info, 'sql'), #Query 2
+    'listar_funcionarios_com_aumento': (listar_funcionarios_com_aumento, 'sql'), #Query 3
+    'listar_media_idade_filhos_por_departamento': (listar_media_idade_filhos_por_departamento, 'sql'), #Query 4
+    'listar_estagiarios_com_filho': (listar_estagiarios_com_filho, 'sql'), #Query 5
+    'listar_media_salarios_funcionarios_projetos_concluidos': (listar_media_salarios_funcionarios_projetos_concluidos, 'sql'), #Query 1 TP 4
+    'listar_recursos_mais_utilizados': (listar_recursos_mais_utilizados, 'sql'), #Query 2 TP 4
+    'listar_custo_total_projetos_concluidos_por_departamento': (listar_custo_total_projetos_concluidos_por_departamento, 'sql'), #Query 3 TP 4
+    'listar_projetos_em_execucao': (listar_projetos_em_execucao, 'sql'), #Query 4 TP 4
+    'listar_projeto_maior_numero_dependentes': (listar_projeto_maior_numero_dependentes, 'sql'), #Query 5 TP 4
+    'listar_funcionario_com_maior_salario_medio': (listar_funcionario_com_maior_salario_medio, 'pandas'), #Query 6
+    'listar_analistas_com_duas_filhas': (listar_analistas_com_duas_filhas, 'pandas'), #Query 7
+    'listar_analista_salario_mais_alto': (listar_analista_salario_mais_alto, 'pandas'), #Query 8
+    'listar_departamento_mais_dependentes': (listar_departamento_mais_dependentes, 'sql'), #Query 9
+    'listar_media_salarial_por_departamento': (listar_media_salarial_por_departamento, 'sql'), #Query 10
+}
+
+# Relatórios cujo resultado é salvo em JSON ao final da execução (Queries 1, 2, 3 TP4)
+SAIDAS_JSON = {
+    'listar_media_salarios_funcionarios_projetos_concluidos': 'media_salarios_projetos_concluidos.json',
+    'listar_recursos_mais_utilizados': 'recursos_mais_utilizados.json',
+    'listar_custo_total_projetos_concluidos_por_departamento': 'custo_total_projetos_concluidos.json',
+}
+
+# Saída que repassa o texto impresso para o destino, contando os bytes escritos (para a métrica do relatório)
+class ContadorSaida:
+    def __init__(self, destino):
+        self.destino = destino
+        self.bytes_escritos = 0
+
+    def write(self, texto):
+        self.bytes_escritos += len(texto.encode('utf-8'))
+        return self.destino.write(texto)
+
+    def flush(self):
+        self.destino.flush()
+
+# Função para rodar um relatório no processo atual, imprimindo direto na saída padrão
+def executar_relatorio_direto(nome, parametros=None):
+    saida = ContadorSaida(sys.stdout)
+    with contextlib.redirect_stdout(saida):
+        return executar_relatorio_medido(nome, saida, parametros)
+
+# Função executada em cada processo: roda o relatório capturando o que ele imprime
+def executar_relatorio_em_processo(nome, parametros=None):
+    buffer = io.StringIO()
+    saida = ContadorSaida(buffer)
+    with contextlib.redirect_stdout(saida):
+        resultado = executar_relatorio_medido(nome, saida, parametros)
+    return buffer.getvalue(), resultado
+
+# Função para rodar um relatório (com os parâmetros informados) registrando tempo, linhas do resultado e bytes impressos
+def executar_relatorio_medido(nome, saida, parametros=None):
+    inicio = time.perf_counter()
+    try:
+        resultado = RELATORIOS[nome][0](**(parametros or {}))
+    except Exception as e:
+        resultado = None
+        print(f"\nErro ao executar o relatório {nome}: {e}")
+    registrar_metrica('relatorio', nome, time.perf_counter() - inicio,
+                      linhas=len(resultado) if isinstance(resultado, list) else None,
+                      bytes_saida=saida.bytes_escritos, tipo_relatorio=RELATORIOS[nome][1])
+    return resultado
+
+# Função para rodar um relatório em um processo filho criado por fork. O alvo não precisa ser serializado (pickle),
+# então funciona também quando o script é carregado por runpy/importlib; só o resultado volta pelo pipe.
+def iniciar_processo_relatorio(contexto, nome, parametros=None):
+    receptor, emissor = contexto.Pipe(duplex=False)
+
+    def alvo():
+        # As métricas registradas no processo filho voltam junto com o resultado
+        ja_registradas = len(_metricas)
+        texto, resultado = executar_relatorio_em_processo(nome, parametros)
+        emissor.send((texto, resultado, _metricas[ja_registradas:], _planos_metricas))
+        emissor.close()
+
+    processo = contexto.Process(target=alvo, daemon=True)
+    processo.start()
+    emissor.close()
+    return processo, receptor
+
+# Função para esperar o resultado de um processo de relatório
+def aguardar_processo_relatorio(nome, processo, receptor):
+    try:
+        texto, resultado, metricas, planos = receptor.recv()
+        incorporar_metricas(metricas, planos)
+        return texto, resultado
+    except EOFError:
+        return f"\nErro ao executar o relatório {nome}: o processo terminou com código {processo.exitcode}\n", None
+    finally:
+        processo.join()
+        receptor.close()
+
+# Executor de relatórios: roda os relatórios pandas em paralelo (em processos), imprime as saídas na ordem pedida e grava os
+# JSONs no final. Os relatórios SQL rodam no processo principal e imprimem direto na saída, sem acumular a listagem em memória.
+# `parametros` associa o nome de um relatório aos parâmetros da sua chamada (por exemplo {'listar_recursos_mais_utilizados': {'limite': 5}})
+def executar_relatorios(nomes, max_processos=None, salvar_json=True, parametros=None):
+    parametros = parametros or {}
+
+    # Os DataFrames são carregados uma única vez, antes de criar os processos, que os herdam pelo fork.
+    # Se a carga falhar, só os relatórios pandas falham
+    nomes_pandas = [nome for nome in nomes if RELATORIOS[nome][1] == 'pandas']
+    falhas = {}
+    if nomes_pandas:
+        try:
+            garantir_dataframes()
+        except Exception as e:
+            falhas = {nome: f"\nErro ao executar o relatório {nome}: {e}\n" for nome in nomes_pandas}
+            nomes_pandas = []
+
+    # Processos são criados por fork; sem fork (ou acima de max_processos), os relatórios pandas rodam no processo principal
+    processos = {}
+    if nomes_pandas:
+        import multiprocessing
+        if 'fork' in multiprocessing.get_all_start_methods():
+            contexto = multiprocessing.get_context('fork')
+            for nome in nomes_pandas[:max_processos or os.cpu_count() or 1]:
+                processos[nome] = iniciar_processo_relatorio(contexto, nome, parametros.get(nome))
+
+    # Só a saída dos relatórios que rodam nos processos fica em memória até chegar a sua vez na ordem pedida
+    resultados = {}
+    for nome in nomes:
+        if nome in falhas:
+            sys.stdout.write(falhas[nome])
+            resultados[nome] = None
+        elif nome in processos:
+            texto, resultados[nome] = aguardar_processo_relatorio(nome, *processos[nome])
+            sys.stdout.write(texto)
+        else:
+            resultados[nome] = executar_relatorio_direto(nome, parametros.get(nome))
+
+    for nome, arquivo in SAIDAS_JSON.items():
+        if salvar_json and resultados.get(nome) is not None:
+            salvar_em_json(arquivo, resultados[nome])
+    return resultados
+
+#Shards por departamento =============================================================================================================
+
+# Diretório com um arquivo SQLite por departamento, cada um com sua própria trava de escrita. O layout é opcional: os shards
+# podem ser gerados a partir do banco principal (shards gerar) ou receber a carga dos CSVs diretamente (load --shards)
+DIRETORIO_SHARDS = 'shards'
+
+# Tabelas de dimensão copiadas inteiras para todos os shards
+TABELAS_REPLICADAS = ['Cargos', 'Departamentos']
+
+# Linhas de cada tabela particionada que pertencem a um departamento, lidas do banco principal (anexado como "origem"):
+# o departamento do funcionário, do funcionário do histórico ou do dependente, do responsável pelo projeto e do projeto do recurso.
+# Partindo dos funcionários do departamento (ix_Funcionarios_DepartamentoID), cada shard lê só as suas linhas
+PARTICOES_SHARDS = {
+    'Funcionarios': "origem.Funcionarios x WHERE x.DepartamentoID = ?",
+    'Dependentes': """origem.Funcionarios f JOIN origem.Dependentes x ON x.FuncionarioID = f.FuncionarioID
+        WHERE f.DepartamentoID = ?""",
+    'HistoricoSalarios': """origem.Funcionarios f JOIN origem.HistoricoSalarios x ON x.FuncionarioID = f.FuncionarioID
+        WHERE f.DepartamentoID = ?""",
+    'Projetos': """origem.Funcionarios f JOIN origem.Projetos x ON x.FuncionarioResponsavelID = f.FuncionarioID
+        WHERE f.DepartamentoID = ?""",
+    'RecursosProjetos': """origem.Funcionarios f JOIN origem.Projetos p ON p.FuncionarioResponsavelID = f.FuncionarioID
+        JOIN origem.RecursosProjetos x ON x.ProjetoID = p.ProjetoID
+        WHERE f.DepartamentoID = ?""",
+}
+
+# Linhas sem departamento (ou sem funcionário/projeto correspondente), que vão para o shard sem_departamento
+ORFAOS_SHARDS = {
+    'Funcionarios': "origem.Funcionarios x WHERE x.DepartamentoID IS NULL",
+    'Dependentes': """origem.Dependentes x LEFT JOIN origem.Funcionarios f ON f.FuncionarioID = x.FuncionarioID
+        WHERE f.DepartamentoID IS NULL""",
+    'HistoricoSalarios': """origem.HistoricoSalarios x LEFT JOIN origem.Funcionarios f ON f.FuncionarioID = x.FuncionarioID
+        WHERE f.DepartamentoID IS NULL""",
+    'Projetos': """origem.Projetos x LEFT JOIN origem.Funcionarios f ON f.FuncionarioID = x.FuncionarioResponsavelID
+        WHERE f.DepartamentoID IS NULL""",
+    'RecursosProjetos': """origem.RecursosProjetos x LEFT JOIN origem.Projetos p ON p.ProjetoID = x.ProjetoID
+        LEFT JOIN origem.Funcionarios f ON f.FuncionarioID = p.FuncionarioResponsavelID
+        WHERE f.DepartamentoID IS NULL""",
+}
+
+# Relatórios por departamento respondidos pelos shards: leem apenas ResumoDepartamentos (somas e contagens, que podem ser
+# somadas entre shards) e Departamentos (replicada)
+CONSULTAS_POR_DEPARTAMENTO = [
+    'listar_media_idade_filhos_por_departamento',
+    'listar_media_salarios_funcionarios_projetos_concluidos',
+    'listar_custo_total_projetos_concluidos_por_departamento',
+    'listar_departamento_mais_dependentes',
+    'listar_media_salarial_por_departamento',
+]
+
+# Número máximo de shards anexados (ATTACH) a uma mesma conexão; 10 é o limite padrão de compilação do SQLite
+LIMITE_ANEXOS = 10
+
+# Manifesto do conjunto de shards, gravado por último: os arquivos que fazem parte do conjunto (arquivo -> DepartamentoID) e,
+# para shards gerados a partir do banco principal, o caminho dele e as versões das tabelas no momento da geração.
+# Shards gravados pela carga particionada (load --shards) são a própria origem dos dados e não têm banco de origem
+ARQUIVO_MANIFESTO = 'manifesto.json'
+
+# Função para obter o caminho do shard de um departamento
+def caminho_shard(departamento_id, diretorio=DIRETORIO_SHARDS):
+    nome = 'sem_departamento' if departamento_id is None else f'departamento_{departamento_id}'
+    return os.path.join(diretorio, f'{nome}.db')
+
+# Função para ler o manifesto dos shards (None se não há um conjunto completo)
+def ler_manifesto(diretorio=DIRETORIO_SHARDS):
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+# Função para gravar o manifesto de uma vez (arquivo temporário + os.replace), sem deixar um manifesto pela metade
+def gravar_manifesto(manifesto, diretorio=DIRETORIO_SHARDS):
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=4)
+    os.replace(caminho + '.tmp', caminho)
+
+# Função para ler, de um banco, as versões das tabelas copiadas para os shards
+def versoes_tabelas_shards(caminho_banco):
+    conn = sqlite3.connect(f'file:{caminho_banco}?mode=ro', uri=True)
+    try:
+        versoes = dict(conn.execute("SELECT Tabela, Versao FROM VersoesTabelas;").fetchall())
+    finally:
+        conn.close()
+    return {nome_tabela: versoes.get(nome_tabela, 0) for nome_tabela in [*TABELAS_REPLICADAS, *PARTICOES_SHARDS]}
+
+# Função para listar os shards do conjunto atual. Conjuntos incompletos (sem manifesto, com arquivos faltando ou fora do
+# manifesto) são recusados, assim como shards gerados de um banco principal que mudou depois da geração
+def listar_shards(verificar_origem=True):
+    manifesto = ler_manifesto()
+    if manifesto is None:
+        raise ValueError("Nenhum conjunto completo de shards encontrado: use shards gerar ou load --shards.")
+
+    caminhos = sorted(os.path.join(DIRETORIO_SHARDS, arquivo) for arquivo in manifesto['shards'])
+    existentes = sorted(os.path.join(DIRETORIO_SHARDS, arquivo) for arquivo in os.listdir(DIRETORIO_SHARDS) if arquivo.endswith('.db'))
+    faltando = sorted(set(caminhos) - set(existentes))
+    sobrando = sorted(set(existentes) - set(caminhos))
+    if faltando or sobrando:
+        raise ValueError(f"Conjunto de shards incompleto (faltando: {', '.join(faltando) or '-'}; "
+                         f"fora do manifesto: {', '.join(sobrando) or '-'}).")
+
+    origem = manifesto['origem']
+    if verificar_origem and origem is not None:
+        if not os.path.exists(origem['banco']) or versoes_tabelas_shards(origem['banco']) != origem['versoes']:
+            raise ValueError(f"Shards desatualizados: o banco {origem['banco']} mudou depois da geração; use shards gerar.")
+    return caminhos
+
+# Função para remover um shard e os arquivos de journal dele
+def remover_shard(caminho):
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+
+# Função para gerar o shard de um departamento: mesmas tabelas, resumos, gatilhos e índices do banco principal, só com as
+# linhas do departamento. Cada shard tem sua conexão e seu arquivo, então vários podem ser gerados ao mesmo tempo
+def gerar_shard(departamento_id, diretorio=DIRETORIO_SHARDS):
+    inicio = time.perf_counter()
+    caminho = caminho_shard(departamento_id, diretorio)
+    remover_shard(caminho)
+
+    conn = sqlite3.connect(f'file:{caminho}', uri=True, isolation_level=None)
+    cursor = conn.cursor()
+    for nome, valor in PRAGMAS_CARGA.items():
+        cursor.execute(f"PRAGMA {nome} = {valor};")
+    cursor.execute("ATTACH DATABASE ? AS origem;", (f'file:{CAMINHO_BANCO}?mode=ro',))
 
+    linhas = 0
+    try:
+        cursor.execute("BEGIN;")
+        for query in ESQUEMAS.values():
+            cursor.execute(query)
+        for nome_tabela in [*TABELAS_REPLICADAS, *PARTICOES_SHARDS]:
+            # As colunas são casadas pelo nome: tabelas reescritas pelo to_sql podem ter outra ordem
+            colunas_shard = {coluna[1] for coluna in cursor.execute(f"PRAGMA main.table_info({nome_tabela});")}
+            colunas = [coluna[1] for coluna in cursor.execute(f"PRAGMA origem.table_info({nome_tabela});")
+                       if coluna[1] in colunas_shard]
+            if nome_tabela in TABELAS_REPLICADAS:
+                origem, parametros = f"origem.{nome_tabela} x", ()
+            elif departamento_id is None:
+                origem, parametros = ORFAOS_SHARDS[nome_tabela], ()
+            else:
+                origem, parametros = PARTICOES_SHARDS[nome_tabela], (departamento_id,)
+            cursor.execute(
+                f"INSERT INTO main.{nome_tabela} ({', '.join(colunas)}) "
+                f"SELECT {', '.join('x.' + coluna for coluna in colunas)} FROM {origem};", parametros
+            )
+            linhas += cursor.rowcount
+        criar_gatilhos_resumo(cursor)
+        reconstruir_resumos(cursor)
+        for query in INDICES.values():
+            cursor.execute(query)
+        cursor.execute("COMMIT;")
+        cursor.execute("DETACH DATABASE origem;")
+        cursor.execute("ANALYZE;")
+        cursor.execute("PRAGMA journal_mode = WAL;")
+    except Exception:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK;")
+        raise
+    finally:
+        conn.close()
 
+    registrar_metrica('shard', os.path.basename(caminho), time.perf_counter() - inicio, linhas=linhas,
+                      departamento=departamento_id)
+    return linhas
 
+# Função para (re)gerar todos os shards a partir do banco principal, em paralelo (um shard por thread). O conjunto novo é
+# montado em um diretório temporário e só substitui o atual quando está completo, junto com o manifesto
+def gerar_shards(max_threads=None):
+    import shutil
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Shards carregados diretamente (load --shards) têm dados que não estão no banco principal: não são sobrescritos
+    manifesto = ler_manifesto()
+    if manifesto is not None and manifesto['origem'] is None:
+        print(f"\nErro ao gerar os shards: os shards em {DIRETORIO_SHARDS} foram carregados diretamente e são a origem dos dados. "
+              f"Remova o diretório para gerá-los a partir do banco principal.")
+        return None
+
+    temporario = DIRETORIO_SHARDS + '.tmp'
+    shutil.rmtree(temporario, ignore_errors=True)
+    os.makedirs(temporario)
+
+    totais = {}
+    try:
+        versoes = versoes_tabelas_shards(CAMINHO_BANCO)
+        conn = obter_conexao(somente_leitura=True)
+        departamentos = [linha[0] for linha in conn.execute("SELECT DISTINCT DepartamentoID FROM Funcionarios ORDER BY DepartamentoID;")]
+        if None not in departamentos:
+            departamentos.append(None)
+
+        with ThreadPoolExecutor(max_workers=max_threads or min(32, (os.cpu_count() or 1) + 4)) as threads:
+            for departamento_id, linhas in zip(departamentos, threads.map(partial(gerar_shard, diretorio=temporario), departamentos)):
+                totais[caminho_shard(departamento_id)] = linhas
+
+        # Uma carga no banco principal durante a geração deixaria shards de versões diferentes
+        if versoes_tabelas_shards(CAMINHO_BANCO) != versoes:
+            raise ValueError(f"o banco {CAMINHO_BANCO} foi alterado durante a geração")
+        gravar_manifesto({
+            'origem': {'banco': os.path.abspath(CAMINHO_BANCO), 'versoes': versoes},
+            'shards': {os.path.basename(caminho_shard(departamento_id)): departamento_id for departamento_id in departamentos},
+        }, temporario)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        shutil.rmtree(temporario, ignore_errors=True)
+        print(f"\nErro ao gerar os shards: {e}. O conjunto anterior foi mantido.")
+        return None
+
+    shutil.rmtree(DIRETORIO_SHARDS, ignore_errors=True)
+    os.replace(temporario, DIRETORIO_SHARDS)
+    for caminho, linhas in totais.items():
+        print(f"\nShard {caminho}: {linhas} linhas.")
+    return totais
+
+# Função para ler o ResumoDepartamentos de um lote de shards, anexados (ATTACH) a uma conexão em memória
+def ler_resumos_shards(caminhos):
+    conn = sqlite3.connect(':memory:', uri=True)
+    try:
+        for indice, caminho in enumerate(caminhos):
+            conn.execute(f"ATTACH DATABASE ? AS shard{indice};", (f'file:{caminho}?mode=ro',))
+        query = " UNION ALL ".join(f"SELECT * FROM shard{indice}.ResumoDepartamentos" for indice in range(len(caminhos)))
+        return conn.execute(query).fetchall()
+    finally:
+        conn.close()
+
+# Consultas por departamento em todos os shards: os lotes de shards são lidos em paralelo, os agregados parciais (somas e
+# contagens) são somados por departamento e as consultas registradas rodam sem alteração sobre o resumo combinado
+def consultar_shards(nomes=None, max_threads=None):
+    from concurrent.futures import ThreadPoolExecutor
+
+    nomes = nomes or CONSULTAS_POR_DEPARTAMENTO
+    caminhos = listar_shards()
+
+    inicio = time.perf_counter()
+    lotes = [caminhos[indice:indice + LIMITE_ANEXOS] for indice in range(0, len(caminhos), LIMITE_ANEXOS)]
+    with ThreadPoolExecutor(max_workers=max_threads or min(32, (os.cpu_count() or 1) + 4)) as threads:
+        parciais = [linha for linhas in threads.map(ler_resumos_shards, lotes) for linha in linhas]
+
+    conn = sqlite3.connect(':memory:', uri=True, isolation_level=None)
+    try:
+        conn.execute(ESQUEMAS['ResumoDepartamentos'])
+        conn.execute(ESQUEMAS['Departamentos'])
+        colunas = [coluna[1] for coluna in conn.execute("PRAGMA table_info(ResumoDepartamentos);")]
+        conn.execute("CREATE TEMP TABLE Parciais AS SELECT * FROM ResumoDepartamentos WHERE 0;")
+        conn.executemany(f"INSERT INTO Parciais VALUES ({', '.join('?' for _ in colunas)});", parciais)
+        conn.execute(
+            f"INSERT INTO ResumoDepartamentos SELECT DepartamentoID, {', '.join(f'SUM({coluna})' for coluna in colunas[1:])} "
+            f"FROM Parciais GROUP BY DepartamentoID;"
+        )
+
+        # Departamentos é replicada: basta a cópia de um dos shards
+        conn.execute("ATTACH DATABASE ? AS replica;", (f'file:{caminhos[0]}?mode=ro',))
+        conn.execute("INSERT INTO main.Departamentos SELECT * FROM replica.Departamentos;")
+        conn.execute("DETACH DATABASE replica;")
+
+        resultados = {}
+        for nome in nomes:
+            cursor = conn.execute(CONSULTAS_RELATORIOS[nome], parametros_consulta(nome))
+            colunas_resultado = [description[0] for description in cursor.description]
+            resultados[nome] = [dict(zip(colunas_resultado, linha)) for linha in cursor]
+    finally:
+        conn.close()
+
+    registrar_metrica('consulta_shards', ', '.join(nomes), time.perf_counter() - inicio, linhas=len(parciais),
+                      shards=len(caminhos), lotes=len(lotes))
+    return resultados
+
+# Relatório das consultas por departamento respondidas pelos shards
+def listar_consultas_shards(nomes=None, max_threads=None):
+    try:
+        total_shards = len(listar_shards())
+        resultados = consultar_shards(nomes, max_threads)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"\nErro ao consultar os shards: {e}")
+        return None
+    for nome, linhas in resultados.items():
+        print(f"{nome} (em {total_shards} shards):")
+        for linha in linhas:
+            print(linha)
+        print("\n=====================================================================")
+    return resultados
+
+# Carga particionada: as linhas dos CSVs são gravadas diretamente no shard do seu departamento, sem passar pelo banco principal.
+# Cada shard é gravado por uma thread com a sua conexão, então a carga de departamentos diferentes não disputa a mesma trava
+
+# Coluna que leva cada linha ao seu departamento e a tabela cuja chave ela referencia (None: a coluna já é o DepartamentoID).
+# As tabelas referenciadas vêm antes na ORDEM_CARGA, e as chaves já gravadas nos shards são lidas no início da carga
+ROTEAMENTO_SHARDS = {
+    'Funcionarios': ('DepartamentoID', None),
+    'Dependentes': ('FuncionarioID', 'Funcionarios'),
+    'HistoricoSalarios': ('FuncionarioID', 'Funcionarios'),
+    'Projetos': ('FuncionarioResponsavelID', 'Funcionarios'),
+    'RecursosProjetos': ('ProjetoID', 'Projetos'),
+}
+
+# Lotes em espera na fila de cada shard; limita a memória quando um shard grava mais devagar do que os CSVs são lidos
+LOTES_EM_ESPERA_SHARD = 4
+
+# Função para normalizar uma chave lida do CSV (texto) ou de um shard (inteiro, ou REAL quando gravada pelo to_sql)
+def chave_roteamento(valor):
+    if valor is None:
+        return None
+    try:
+        return int(float(valor))
+    except (TypeError, ValueError):
+        return valor
+
+# Função executada pela thread de cada shard: grava os lotes recebidos pela fila em uma única transação, com os pragmas da
+# carga em massa e os gatilhos dos resumos desligados. Um shard novo recebe o esquema e as dimensões já replicadas.
+# Se a carga for cancelada (erro na leitura dos CSVs), a transação é desfeita
+def gravar_lotes_shard(caminho, fila, dimensoes, novo, cancelada):
+    conn = sqlite3.connect(f'file:{caminho}', uri=True, isolation_level=None)
+    cursor = conn.cursor()
+    pragmas_originais = {nome: cursor.execute(f"PRAGMA {nome};").fetchone()[0] for nome in PRAGMAS_CARGA}
+    for nome, valor in PRAGMAS_CARGA.items():
+        cursor.execute(f"PRAGMA {nome} = {valor};")
+
+    total = 0
+    tabelas = set()
+    fim_recebido = False
+    try:
+        cursor.execute("BEGIN;")
+        if novo:
+            for query in ESQUEMAS.values():
+                cursor.execute(query)
+        atualizar_colunas_resumos(cursor)
+        remover_gatilhos_resumo(cursor)
+        for nome_tabela, cabecalho, linhas in dimensoes:
+            cursor.executemany(f"INSERT OR REPLACE INTO {nome_tabela} ({', '.join(cabecalho)}) "
+                               f"VALUES ({', '.join('?' * len(cabecalho))});", linhas)
+        while (lote := fila.get()) is not None:
+            nome_tabela, cabecalho, linhas = lote
+            cursor.executemany(f"INSERT OR REPLACE INTO {nome_tabela} ({', '.join(cabecalho)}) "
+                               f"VALUES ({', '.join('?' * len(cabecalho))});", linhas)
+            tabelas.add(nome_tabela)
+            if nome_tabela not in TABELAS_REPLICADAS:
+                total += len(linhas)
+        fim_recebido = True
+        if cancelada.is_set():
+            raise RuntimeError("carga cancelada")
+        for nome_tabela in tabelas:
+            incrementar_versao_tabela(cursor, nome_tabela)
+        criar_gatilhos_resumo(cursor)
+        reconstruir_resumos(cursor)
+        for query in INDICES.values():
+            cursor.execute(query)
+        cursor.execute("COMMIT;")
+    except Exception:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK;")
+        # Esvaziar a fila até o fim da leitura, para que a leitura dos CSVs não fique bloqueada esperando espaço nela
+        while not fim_recebido and fila.get() is not None:
+            pass
+        raise
+    finally:
+        for nome, valor in pragmas_originais.items():
+            cursor.execute(f"PRAGMA {nome} = {valor};")
+        if novo:
+            cursor.execute("PRAGMA journal_mode = WAL;")
+        conn.close()
+    return total
+
+# Carga dos CSVs direto nos shards: as linhas são lidas em lotes (como na carga em massa), separadas por departamento e
+# enviadas à fila do shard correspondente. Cargos e Departamentos vão para todos os shards. Linhas sem departamento vão para
+# o shard sem_departamento. Funcionários e projetos que já estão em outro shard não são movidos: essas linhas são ignoradas
+def carregar_em_shards(arquivos=ORDEM_CARGA, tamanho_lote=50000, recriar=False):
+    import queue
+    import shutil
+
+    inicio = time.perf_counter()
+    if recriar:
+        shutil.rmtree(DIRETORIO_SHARDS, ignore_errors=True)
+    os.makedirs(DIRETORIO_SHARDS, exist_ok=True)
+
+    # Conjunto atual (vazio quando não há shards) e chaves já gravadas nele, para rotear as tabelas que as referenciam
+    manifesto = ler_manifesto()
+    try:
+        shards = listar_shards(verificar_origem=False) if manifesto else []
+    except ValueError as e:
+        print(f"\nErro na carga particionada: {e} Use load --shards --completo para recriar os shards.")
+        return None
+    if manifesto is None:
+        if any(arquivo.endswith('.db') for arquivo in os.listdir(DIRETORIO_SHARDS)):
+            print(f"\nErro na carga particionada: há shards em {DIRETORIO_SHARDS} sem manifesto. "
+                  f"Use load --shards --completo para recriá-los.")
+            return None
+        manifesto = {'origem': None, 'shards': {}}
+    departamentos_shards = {os.path.join(DIRETORIO_SHARDS, arquivo): departamento_id
+                            for arquivo, departamento_id in manifesto['shards'].items()}
+
+    chaves = {referencia: {} for _, referencia in ROTEAMENTO_SHARDS.values() if referencia}
+    dimensoes = []
+    for caminho in shards:
+        conn = sqlite3.connect(f'file:{caminho}?mode=ro', uri=True)
+        try:
+            for nome_tabela, departamentos in chaves.items():
+                for (chave,) in conn.execute(f"SELECT {CHAVES_PRIMARIAS[nome_tabela]} FROM {nome_tabela};"):
+                    departamentos[chave_roteamento(chave)] = departamentos_shards[caminho]
+            # As dimensões são iguais em todos os shards: as de um deles servem de ponto de partida para os shards novos
+            if not dimensoes:
+                for nome_tabela in TABELAS_REPLICADAS:
+                    cursor = conn.execute(f"SELECT * FROM {nome_tabela};")
+                    dimensoes.append((nome_tabela, [coluna[0] for coluna in cursor.description], cursor.fetchall()))
+        finally:
+            conn.close()
+
+    # Uma fila e uma thread gravadora por shard, criadas quando o shard recebe a primeira linha
+    filas, threads, resultados = {}, {}, {}
+    cancelada = threading.Event()
+
+    def fila_shard(departamento_id):
+        if departamento_id not in filas:
+            caminho = caminho_shard(departamento_id)
+            filas[departamento_id] = queue.Queue(maxsize=LOTES_EM_ESPERA_SHARD)
+
+            def alvo(fila=filas[departamento_id], iniciais=list(dimensoes)):
+                try:
+                    resultados[departamento_id] = gravar_lotes_shard(caminho, fila, iniciais, caminho not in shards, cancelada)
+                except Exception as e:
+                    resultados[departamento_id] = e
+
+            threads[departamento_id] = threading.Thread(target=alvo, daemon=True)
+            threads[departamento_id].start()
+        return filas[departamento_id]
+
+    # Linhas enviadas por tabela e por shard, para que o total não conte as linhas de um shard cuja gravação falhou
+    distribuidas, ignoradas = {}, {}
+    try:
+        for nome_tabela, arquivo_csv in arquivos:
+            distribuidas[nome_tabela], ignoradas[nome_tabela] = {}, 0
+            for cabecalho, lote in ler_csv_em_lotes(arquivo_csv, tamanho_lote):
+                if nome_tabela in TABELAS_REPLICADAS:
+                    dimensoes.append((nome_tabela, cabecalho, lote))
+                    for departamento_id in {*departamentos_shards.values(), *filas}:
+                        fila_shard(departamento_id).put((nome_tabela, cabecalho, lote))
+                    distribuidas[nome_tabela][None] = distribuidas[nome_tabela].get(None, 0) + len(lote)
+                    continue
+
+                coluna, referencia = ROTEAMENTO_SHARDS[nome_tabela]
+                posicao = cabecalho.index(coluna)
+                posicao_chave = cabecalho.index(CHAVES_PRIMARIAS[nome_tabela])
+                particoes = {}
+                for linha in lote:
+                    departamento_id = chave_roteamento(linha[posicao])
+                    if referencia is not None:
+                        departamento_id = chaves[referencia].get(departamento_id)
+                    if nome_tabela in chaves:
+                        chave = chave_roteamento(linha[posicao_chave])
+                        if chaves[nome_tabela].get(chave, departamento_id) != departamento_id:
+                            ignoradas[nome_tabela] += 1
+                            continue
+                        chaves[nome_tabela][chave] = departamento_id
+                    particoes.setdefault(departamento_id, []).append(linha)
+                for departamento_id, linhas in particoes.items():
+                    fila_shard(departamento_id).put((nome_tabela, cabecalho, linhas))
+                    distribuidas[nome_tabela][departamento_id] = distribuidas[nome_tabela].get(departamento_id, 0) + len(linhas)
+    except Exception as e:
+        cancelada.set()
+        print(f"\nErro na carga particionada: {e}. Nenhum shard foi alterado.")
+    finally:
+        for fila in filas.values():
+            fila.put(None)
+        for thread in threads.values():
+            thread.join()
+
+    # Shards novos que falharam são removidos; os que foram gravados entram no manifesto, que passa a não ter banco de origem
+    falhas = {departamento_id: erro for departamento_id, erro in resultados.items() if isinstance(erro, Exception)}
+    for departamento_id, erro in falhas.items():
+        if caminho_shard(departamento_id) not in shards:
+            remover_shard(caminho_shard(departamento_id))
+        if not cancelada.is_set():
+            print(f"\nErro na carga do shard {caminho_shard(departamento_id)}: {erro}")
+    if cancelada.is_set():
+        return None
+    gravados = [departamento_id for departamento_id in resultados if departamento_id not in falhas]
+    manifesto['shards'].update({os.path.basename(caminho_shard(departamento_id)): departamento_id for departamento_id in gravados})
+    if gravados:
+        manifesto['origem'] = None
+    gravar_manifesto(manifesto)
+
+    totais = {}
+    for nome_tabela, por_shard in distribuidas.items():
+        # As dimensões replicadas são contadas uma vez (chave None), e não por shard
+        totais[nome_tabela] = sum(linhas for departamento_id, linhas in por_shard.items()
+                                  if nome_tabela in TABELAS_REPLICADAS or departamento_id not in falhas)
+    for nome_tabela, total in totais.items():
+        print(f"\nTabela {nome_tabela}: {total} linhas distribuídas nos shards.")
+        if ignoradas[nome_tabela]:
+            print(f"{ignoradas[nome_tabela]} linhas ignoradas: a chave já está no shard de outro departamento.")
+    registrar_metrica('carga_shards', ', '.join(totais), time.perf_counter() - inicio,
+                      linhas=sum(totais.values()), shards=len(gravados), falhas=len(falhas))
+    return totais
+
+#Gerador de dados sintéticos e benchmark =============================================================================================
+
+# Escalas de benchmark, em número de funcionários; as demais tabelas crescem na mesma proporção dos CSVs de exemplo
+ESCALAS = {
+    '1k': 1_000,
+    '10k': 10_000,
+    '100k': 100_000,
+    '1M': 1_000_000,
+    '10M': 10_000_000,
+}
+
+# Distribuições usadas pelo gerador, tiradas dos CSVs de exemplo
+CARGOS_SINTETICOS = [
+    (1, 'Diretor', 9000, 'Diretor', 'Odontológico, Transporte, Médico, Alimentação'),
+    (2, 'Gerente', 8000, 'Gerente', 'Odontológico, Transporte, Alimentação'),
+    (3, 'Analista', 5000, 'Analista', 'Odontológico, Transporte, Alimentação'),
+    (4, 'Técnico de Suporte', 3000, 'Técnico', 'Transporte, Alimentação'),
+    (5, 'Estagiário', 2000, 'Estagiário', 'Transporte, Alimentação'),
+]
+PESOS_CARGOS = [1, 2, 4, 6, 4]
+NOMES_DEPARTAMENTOS = ['TI', 'Marketing', 'Vendas', 'Suporte Técnico', 'Financeiro']
+GENEROS = ['Feminino', 'Masculino']
+STATUS_PROJETOS = ['Concluído', 'Em Execução', 'Em Planejamento', 'Cancelado']
+PESOS_STATUS = [5, 10, 4, 1]
+RECURSOS_SINTETICOS = {
+    'Material': ['Servidores', 'Espaço em nuvem', 'Equipamentos de rede', 'Ferramentas de análise de dados', 'Plataformas de CRM'],
+    'Humano': ['Desenvolvedores', 'Consultores', 'Analistas de processos', 'Especialistas em migração'],
+    'Financeiro': ['Licenças de software', 'Licenças de ERP', 'Serviços de hospedagem', 'Serviços de design'],
+}
+PESOS_RECURSOS = [11, 8, 6]
+
+# Proporções por funcionário observadas nos CSVs de exemplo (12 funcionários, 30 dependentes, 73 registros de salário, 20 projetos)
+DEPENDENTES_POR_FUNCIONARIO = 2.5
+MESES_HISTORICO = 10
+PROJETOS_POR_FUNCIONARIO = 1.6
+RECURSOS_POR_PROJETO = 1.25
+FUNCIONARIOS_POR_DEPARTAMENTO = 1000
+
+# Função para gravar um CSV no mesmo formato dos arquivos de exemplo (separador ';'), linha a linha
+def gravar_csv(caminho, cabecalho, linhas):
+    with open(caminho, 'w', newline='', encoding='utf-8') as f:
+        escritor = csv.writer(f, delimiter=';')
+        escritor.writerow(cabecalho)
+        escritor.writerows(linhas)
+
+# Função para somar meses a uma data (ano, mes, dia) e devolvê-la no formato AAAA-MM-DD
+def data_mais_meses(ano, mes, dia, meses):
+    total = ano * 12 + (mes - 1) + meses
+    return f"{total // 12:04d}-{total % 12 + 1:02d}-{dia:02d}"
+
+# Gerador de dados sintéticos: grava os sete CSVs com chaves estrangeiras válidas, sem manter as tabelas na memória
+def gerar_dados_sinteticos(diretorio, numero_funcionarios, semente=42):
+    import random
+
+    aleatorio = random.Random(semente)
+    os.makedirs(diretorio, exist_ok=True)
+    numero_departamentos = max(len(NOMES_DEPARTAMENTOS), numero_funcionarios // FUNCIONARIOS_POR_DEPARTAMENTO)
+    numero_projetos = int(numero_funcionarios * PROJETOS_POR_FUNCIONARIO)
+    caminhos = {nome_tabela: os.path.join(diretorio, arquivo) for nome_tabela, arquivo in ORDEM_CARGA}
+
+    gravar_csv(caminhos['Cargos'], ['CargoID', 'Descricao', 'SalarioBase', 'Nivel', 'Beneficios'], CARGOS_SINTETICOS)
+
+    gravar_csv(caminhos['Departamentos'], ['DepartamentoID', 'NomeDepartamento', 'GerenteID', 'Andar', 'Funcoes'], (
+        (i, f"{NOMES_DEPARTAMENTOS[(i - 1) % len(NOMES_DEPARTAMENTOS)]} {i}", aleatorio.randint(1, numero_funcionarios),
+         aleatorio.randint(1, 20), f"Setor {i}")
+        for i in range(1, numero_departamentos + 1)
+    ))
+
+    # O salário de cada funcionário é guardado para gerar um histórico coerente com ele
+    salarios = []
+    def linhas_funcionarios():
+        for i in range(1, numero_funcionarios + 1):
+            cargo = aleatorio.choices(CARGOS_SINTETICOS, PESOS_CARGOS)[0]
+            salario = round(cargo[2] * aleatorio.uniform(0.9, 1.2))
+            salarios.append(salario)
+            yield (i, f"Funcionario {i}", cargo[0], aleatorio.randint(1, numero_departamentos), salario, aleatorio.choice(GENEROS))
+    gravar_csv(caminhos['Funcionarios'], ['FuncionarioID', 'Nome', 'CargoID', 'DepartamentoID', 'Salario', 'Genero'],
+               linhas_funcionarios())
+
+    def linhas_dependentes():
+        dependente_id = 0
+        for funcionario_id in range(1, numero_funcionarios + 1):
+            for _ in range(aleatorio.randint(0, round(2 * DEPENDENTES_POR_FUNCIONARIO))):
+                dependente_id += 1
+                yield (dependente_id, funcionario_id, f"Dependente {dependente_id}", aleatorio.choice(GENEROS),
+                       aleatorio.randint(0, 25))
+    gravar_csv(caminhos['Dependentes'], ['DependenteID', 'FuncionarioID', 'Nome', 'Genero', 'Idade'], linhas_dependentes())
+
+    # Histórico mensal a partir de 2023-01-05, com aumentos ocasionais
+    def linhas_historico():
+        historico_id = 0
+        for funcionario_id, salario in enumerate(salarios, start=1):
+            for mes in range(MESES_HISTORICO):
+                if mes and aleatorio.random() < 0.15:
+                    salario = round(salario * aleatorio.uniform(1.01, 1.08))
+                historico_id += 1
+                yield (historico_id, funcionario_id, data_mais_meses(2023, 1, 5, mes), salario)
+    gravar_csv(caminhos['HistoricoSalarios'], ['HistoricoSalarioID', 'FuncionarioID', 'Data', 'Salario'], linhas_historico())
+
+    # As datas de início de cada projeto são guardadas para que os recursos sejam usados durante o projeto
+    inicios = []
+    def linhas_projetos():
+        for i in range(1, numero_projetos + 1):
+            ano, mes, dia = aleatorio.randint(2022, 2024), aleatorio.randint(1, 12), aleatorio.randint(1, 28)
+            duracao = aleatorio.randint(3, 12)
+            inicios.append((ano, mes, dia, duracao))
+            yield (i, f"Projeto {i}", f"Descrição do projeto {i}", data_mais_meses(ano, mes, dia, 0),
+                   data_mais_meses(ano, mes, dia, duracao), aleatorio.randint(1, numero_funcionarios),
+                   f"{aleatorio.randint(10, 200) * 1000:.2f}", aleatorio.choices(STATUS_PROJETOS, PESOS_STATUS)[0])
+    gravar_csv(caminhos['Projetos'], ['ProjetoID', 'NomeProjeto', 'DescricaoProjeto', 'DataInicio', 'DataConclusao',
+                                      'FuncionarioResponsavelID', 'Custo', 'Status'], linhas_projetos())
+
+    def linhas_recursos():
+        recurso_id = 0
+        for projeto_id, (ano, mes, dia, duracao) in enumerate(inicios, start=1):
+            for _ in range(aleatorio.randint(0, round(2 * RECURSOS_POR_PROJETO))):
+                recurso_id += 1
+                tipo = aleatorio.choices(list(RECURSOS_SINTETICOS), PESOS_RECURSOS)[0]
+                yield (recurso_id, projeto_id, aleatorio.choice(RECURSOS_SINTETICOS[tipo]), tipo, aleatorio.randint(1, 20),
+                       data_mais_meses(ano, mes, dia, aleatorio.randint(0, duracao)))
+    gravar_csv(caminhos['RecursosProjetos'], ['RecursosProjetoID', 'ProjetoID', 'DescricaoRecurso', 'TipoRecurso',
+                                              'QuantidadeRecurso', 'DataUtilizacao'], linhas_recursos())
+    return caminhos
+
+# Função para medir o tempo e, opcionalmente, o pico de memória (alocações Python, incluindo NumPy/pandas) de uma chamada
+def medir(funcao, *args, rastrear_memoria=True, **kwargs):
+    import tracemalloc
+
+    # O tracemalloc deixa o código medido mais lento; com rastrear_memoria=False o tempo fica mais fiel
+    if rastrear_memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        # A saída é descartada (os.devnull), e não guardada em memória: listagens grandes inflariam o pico medido
+        with open(os.devnull, 'w', encoding='utf-8') as descarte, contextlib.redirect_stdout(descarte):
+            resultado = funcao(*args, **kwargs)
+        erro = None
+    except Exception as e:
+        resultado, erro = None, str(e)
+    segundos = time.perf_counter() - inicio
+    medicao = {'segundos': segundos}
+    if rastrear_memoria:
+        medicao['pico_memoria_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    if erro:
+        medicao['erro'] = erro
+    return medicao, resultado
+
+# Função para apontar o script para outro banco e outro diretório de snapshots (o cache de consultas é esvaziado)
+def usar_banco(caminho_banco, diretorio_snapshots, arquivos_tabelas=None):
+    global CAMINHO_BANCO, DIRETORIO_SNAPSHOTS, ARQUIVOS_TABELAS, df_fato_funcionarios
+    fechar_conexoes()
+    limpar_cache()
+    df_fato_funcionarios = None
+    anterior = (CAMINHO_BANCO, DIRETORIO_SNAPSHOTS, ARQUIVOS_TABELAS)
+    CAMINHO_BANCO, DIRETORIO_SNAPSHOTS = caminho_banco, diretorio_snapshots
+    ARQUIVOS_TABELAS = arquivos_tabelas or dict(ORDEM_CARGA)
+    return anterior
+
+# Benchmark: para cada escala gera os dados, mede a ingestão e cada relatório e salva os resultados em JSON
+def executar_benchmark(escalas=('1k', '10k'), diretorio='benchmark', arquivo_resultados=None, semente=42, rastrear_memoria=True):
+    # Os módulos importados sob demanda são carregados antes das medições: o custo único da importação não entra no tempo
+    # da primeira operação medida
+    import concurrent.futures
+    import hashlib
+    import multiprocessing
+    import numpy
+    import pandas
+
+    resultados = {'inicio': time.strftime('%Y-%m-%dT%H:%M:%S'), 'rastrear_memoria': rastrear_memoria, 'escalas': {}}
+    medir_escala = partial(medir, rastrear_memoria=rastrear_memoria)
+    for escala in escalas:
+        diretorio_escala = os.path.join(diretorio, escala)
+        caminho_banco = os.path.join(diretorio_escala, 'benchmark.db')
+        medicao_geracao, caminhos = medir_escala(gerar_dados_sinteticos, diretorio_escala, ESCALAS[escala], semente)
+
+        if os.path.exists(caminho_banco):
+            os.remove(caminho_banco)
+        anterior = usar_banco(caminho_banco, os.path.join(diretorio_escala, 'snapshots'),
+                              {nome_tabela: caminhos[nome_tabela] for nome_tabela in caminhos})
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for nome_tabela, query in ESQUEMAS.items():
+                    criar_tabela(nome_tabela, query)
+                preparar_resumos()
+
+            arquivos = [(nome_tabela, caminhos[nome_tabela]) for nome_tabela, _ in ORDEM_CARGA]
+            medicoes = {
+                'geracao_csv': medicao_geracao,
+                'carga_em_massa': medir_escala(carregar_em_massa, arquivos)[0],
+                'criar_indices': medir_escala(criar_indices)[0],
+                'inserir_dados_incremental_sem_alteracao': medir_escala(
+                    lambda: [inserir_dados(nome_tabela, arquivo, incremental=True) for nome_tabela, arquivo in arquivos]
+                )[0],
+                'carregar_dataframes': medir_escala(carregar_dataframes)[0],
+            }
+            # O cache de consultas é limpo antes de cada medição: os tempos são do banco, e não de acertos no cache
+            relatorios = {}
+            for nome, (funcao, _) in RELATORIOS.items():
+                limpar_cache()
+                relatorios[nome] = medir_escala(funcao)[0]
+            limpar_cache()
+            medicoes['lote_completo'] = medir_escala(executar_relatorios, list(RELATORIOS), salvar_json=False)[0]
+        finally:
+            usar_banco(*anterior)
+
+        resultados['escalas'][escala] = {
+            'funcionarios': ESCALAS[escala],
+            'tamanho_banco_bytes': os.path.getsize(caminho_banco),
+            'ingestao': medicoes,
+            'relatorios': relatorios,
+        }
+        print(f"\nBenchmark da escala {escala} concluído.")
+
+    if resource is not None:
+        # ru_maxrss é o pico de memória residente do processo inteiro (em KiB no Linux)
+        resultados['pico_rss_processo_kib'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    arquivo_resultados = arquivo_resultados or os.path.join(diretorio, f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(arquivo_resultados, 'w', encoding="utf-8") as f:
+        json.dump(resultados, f, indent=4, ensure_ascii=False)
+    print(f"\nResultados do benchmark salvos em {arquivo_resultados}")
+    return resultados
+
+#Linha de comando =====================================================================================================================
+
+# Comando init: cria as tabelas, os gatilhos das tabelas de resumo e os índices
+def inicializar():
+    for nome_tabela, query in ESQUEMAS.items():
+        criar_tabela(nome_tabela, query)
+    preparar_resumos()
+    criar_indices()
+
+# Comando load: atualiza os resumos de bancos antigos, carrega os CSVs (incremental por padrão) e recria os índices que a carga
+# possa ter descartado
+def carregar(massa=False, completo=False, shards=False):
+    if shards:
+        carregar_em_shards(recriar=completo)
+        return
+    preparar_resumos()
+    if massa:
+        carregar_em_massa(recriar=completo)
+    else:
+        for nome_tabela, arquivo_csv in ORDEM_CARGA:
+            inserir_dados(nome_tabela, arquivo_csv, incremental=not completo)
+    criar_indices()
+
+# Comando export: grava os resultados das Queries 1, 2 e 3 TP4 direto do banco para os arquivos, em fluxo
+def exportar(formato='json', compactar=False):
+    for nome, arquivo in SAIDAS_JSON.items():
+        if formato == 'ndjson':
+            arquivo = arquivo[:-len('.json')] + '.ndjson'
+        if compactar:
+            arquivo += '.gz'
+        total = exportar_em_fluxo(arquivo, iterar_consulta(nome), formato=formato, compactar=compactar)
+        print(f"\nArquivo {arquivo} exportado com {total} linhas.")
+
+# Função para ler um parâmetro CHAVE=VALOR da linha de comando; números inteiros e decimais são convertidos
+def ler_parametro(texto):
+    chave, separador, valor = texto.partition('=')
+    if not separador or not chave:
+        raise ValueError(f"parâmetro inválido: {texto} (use CHAVE=VALOR)")
+    for conversao in (int, float):
+        try:
+            return chave, conversao(valor)
+        except ValueError:
+            pass
+    return chave, valor
+
+# Função para obter os parâmetros aceitos por um relatório: os argumentos da função ou, quando ela repassa **parametros
+# à consulta registrada, os parâmetros declarados em PARAMETROS_CONSULTAS
+def parametros_relatorio(nome):
+    import inspect
+
+    aceitos = set()
+    for parametro in inspect.signature(RELATORIOS[nome][0]).parameters.values():
+        if parametro.kind == parametro.VAR_KEYWORD:
+            aceitos |= set(PARAMETROS_CONSULTAS.get(nome, {}))
+        elif parametro.kind in (parametro.POSITIONAL_OR_KEYWORD, parametro.KEYWORD_ONLY):
+            aceitos.add(parametro.name)
+    return aceitos
+
+# Função para distribuir os parâmetros da linha de comando entre os relatórios: CHAVE=VALOR vai para todos os relatórios
+# pedidos que aceitam a chave e NOME.CHAVE=VALOR só para o relatório NOME
+def distribuir_parametros(nomes, textos):
+    parametros = {nome: {} for nome in nomes}
+    for texto in textos:
+        chave, valor = ler_parametro(texto)
+        nome, _, chave = chave.rpartition('.')
+        if nome and nome not in parametros:
+            raise ValueError(f"parâmetro {texto} para um relatório que não foi pedido: {nome}")
+        destinos = [destino for destino in ([nome] if nome else nomes) if chave in parametros_relatorio(destino)]
+        if not destinos:
+            raise ValueError(f"nenhum dos relatórios pedidos aceita o parâmetro {chave}" if not nome
+                             else f"o relatório {nome} não aceita o parâmetro {chave}")
+        for destino in destinos:
+            parametros[destino][chave] = valor
+    return {nome: valores for nome, valores in parametros.items() if valores}
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(
+        description="Banco de dados da empresa: criação das tabelas, carga dos CSVs e relatórios. "
+                    "Sem comando, executa tudo (init, load, todos os relatórios e os JSONs)."
+    )
+    subcomandos = parser.add_subparsers(dest='comando')
+
+    subcomandos.add_parser('init', help="cria as tabelas, os gatilhos de resumo e os índices")
+
+    parser_load = subcomandos.add_parser('load', help="carrega os CSVs no banco (incremental por padrão)")
+    parser_load.add_argument('--massa', action='store_true', help="usa a carga em massa em lotes")
+    parser_load.add_argument('--completo', action='store_true',
+                             help="recarrega tudo (com --massa, recria as tabelas a partir do esquema declarado)")
+    parser_load.add_argument('--shards', action='store_true',
+                             help="grava cada linha no shard do seu departamento, em paralelo por shard, em vez do banco principal "
+                                  "(com --completo, recria os shards)")
+
+    parser_report = subcomandos.add_parser('report', help="executa os relatórios indicados, em paralelo")
+    parser_report.add_argument('nomes', nargs='*', metavar='nome', help="nomes dos relatórios ('todos' para todos)")
+    parser_report.add_argument('--listar', action='store_true', help="lista os relatórios disponíveis")
+    parser_report.add_argument('--salvar-json', action='store_true', help="grava também os JSONs dos relatórios do TP4")
+    parser_report.add_argument('-p', '--parametro', action='append', default=[], metavar='[NOME.]CHAVE=VALOR',
+                               help="parâmetro passado aos relatórios indicados que o aceitam, ou só ao relatório NOME "
+                                    "(por exemplo -p limite=5 -p listar_recursos_mais_utilizados.tipo_recurso=Humano)")
+
+    parser_tabela = subcomandos.add_parser('tabela', help="lista uma tabela em ordem de chave primária, página por página")
+    parser_tabela.add_argument('nome_tabela', metavar='tabela')
+    parser_tabela.add_argument('--tamanho-pagina', type=int, default=TAMANHO_PAGINA)
+    parser_tabela.add_argument('--paginas', type=int, help="número de páginas a mostrar (padrão: todas)")
+    parser_tabela.add_argument('--token', help="token devolvido pela listagem anterior, para continuar de onde ela parou")
+
+    parser_export = subcomandos.add_parser('export', help="exporta os resultados das Queries 1, 2 e 3 TP4")
+    parser_export.add_argument('--formato', choices=['json', 'ndjson'], default='json')
+    parser_export.add_argument('--compactar', action='store_true', help="compacta a saída com gzip")
+
+    parser_recursos = subcomandos.add_parser('recursos', help="top-K de uso de recursos em uma fatia, lido do resumo de recursos")
+    parser_recursos.add_argument('-k', type=int, default=3)
+    parser_recursos.add_argument('--por', choices=DIMENSOES_RECURSOS, default='DescricaoRecurso', help="dimensão do ranking")
+    parser_recursos.add_argument('--tipo', dest='tipo_recurso')
+    parser_recursos.add_argument('--descricao', dest='descricao_recurso')
+    parser_recursos.add_argument('--projeto', dest='projeto_id', type=int)
+    parser_recursos.add_argument('--mes', help="AAAA-MM")
+    parser_recursos.add_argument('--mes-inicio', help="AAAA-MM")
+    parser_recursos.add_argument('--mes-fim', help="AAAA-MM")
+
+    parser_shards = subcomandos.add_parser('shards', help="layout opcional com um banco por departamento")
+    parser_shards.add_argument('acao', choices=['gerar', 'report'],
+                               help="gerar: (re)cria os shards a partir do banco principal; report: consultas por departamento nos shards")
+    parser_shards.add_argument('nomes', nargs='*', metavar='nome',
+                               help="consultas a responder (padrão: todas as consultas por departamento)")
+    parser_shards.add_argument('--threads', type=int, help="número máximo de threads")
+
+    subcomandos.add_parser('memoria', help="mostra a memória ocupada pelos DataFrames, com e sem os tipos compactos")
+
+    subcomandos.add_parser('planos', help="mostra o EXPLAIN QUERY PLAN das consultas e aponta varreduras completas")
+
+    parser_benchmark = subcomandos.add_parser('benchmark', help="gera dados sintéticos e mede carga e relatórios")
+    parser_benchmark.add_argument('--escalas', nargs='+', choices=list(ESCALAS), default=['1k', '10k'])
+    parser_benchmark.add_argument('--diretorio', default='benchmark')
+    parser_benchmark.add_argument('--sem-memoria', action='store_true', help="não rastreia o pico de memória (tempos mais fiéis)")
+
+    args = parser.parse_args(argumentos)
+
+    try:
+        if args.comando is None:
+            inicializar()
+            carregar()
+            executar_relatorios(list(RELATORIOS))
+        elif args.comando == 'init':
+            inicializar()
+        elif args.comando == 'load':
+            carregar(massa=args.massa, completo=args.completo, shards=args.shards)
+        elif args.comando == 'report':
+            if args.listar or not args.nomes:
+                for nome, (_, tipo) in RELATORIOS.items():
+                    print(f"{nome} ({tipo})")
+                return
+            nomes = list(RELATORIOS) if args.nomes == ['todos'] else args.nomes
+            desconhecidos = [nome for nome in nomes if nome not in RELATORIOS]
+            if desconhecidos:
+                parser_report.error(f"relatório desconhecido: {', '.join(desconhecidos)}")
+            try:
+                parametros = distribuir_parametros(nomes, args.parametro)
+            except ValueError as e:
+                parser_report.error(str(e))
+            executar_relatorios(nomes, salvar_json=args.salvar_json, parametros=parametros)
+        elif args.comando == 'tabela':
+            listar_tabela(args.nome_tabela, args.tamanho_pagina, args.token, args.paginas)
+        elif args.comando == 'export':
+            exportar(formato=args.formato, compactar=args.compactar)
+        elif args.comando == 'recursos':
+            filtros = {filtro: getattr(args, filtro) for filtro in FILTROS_RECURSOS if getattr(args, filtro) is not None}
+            listar_top_recursos(args.k, args.por, **filtros)
+        elif args.comando == 'shards':
+            if args.acao == 'gerar':
+                gerar_shards(args.threads)
+            else:
+                desconhecidos = [nome for nome in args.nomes if nome not in CONSULTAS_POR_DEPARTAMENTO]
+                if desconhecidos:
+                    parser_shards.error(f"consulta por departamento desconhecida: {', '.join(desconhecidos)}")
+                listar_consultas_shards(args.nomes or None, args.threads)
+        elif args.comando == 'memoria':
+            relatorio_memoria_dataframes()
+        elif args.comando == 'planos':
+            analisar_planos_consultas()
+        elif args.comando == 'benchmark':
+            executar_benchmark(args.escalas, diretorio=args.diretorio, rastrear_memoria=not args.sem_memoria)
+
+        # Salvar as métricas desta execução
+        salvar_metricas()
+    finally:
+        # Fechar as conexões compartilhadas com o banco de dados
+        fechar_conexoes()
+
+if __name__ == '__main__':
+    main()